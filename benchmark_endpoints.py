@@ -0,0 +1,199 @@
+"""
+Benchmarks the endpoints of the api blueprint through the Flask test client, on the data of generate_data.py.
+
+For every scenario the p50 and p99 latency, the database queries per request and the allocated memory per
+request are reported. The allocations are measured in a separate pass, as tracing them slows down the requests.
+
+Store a baseline with --output, and compare a later run with --baseline; the benchmark exits with status 1
+when a scenario got slower, or makes more queries, than the baseline allows.
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from lib.model.models import CampaignModel, PlayerModel
+from lib.database import request_session
+from services.server import app
+
+USERNAME = "user0"
+PASSWORD = "password"
+CAMPAIGN_CODE = "BENCH0"
+
+# Latency differences below this are noise, even when the relative threshold is exceeded.
+MIN_REGRESSION_MS = 0.5
+
+_queries = [0]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    _queries[0] += 1
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints on generated data.")
+
+    parser.add_argument("--iterations", type=int, default=50, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario.")
+    parser.add_argument("--scenario", action="append", help="Only run the given scenario, can be repeated.")
+    parser.add_argument("--output", help="Write the results as JSON to this file, to use as a baseline.")
+    parser.add_argument("--baseline", help="Compare the results with this earlier output.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative increase of the p50 latency over the baseline.")
+    return parser.parse_args()
+
+
+def get_scenarios(campaign_id: int, player_id: int) -> dict:
+    """
+    The benchmarked requests by name, as (method, url, json body).
+    """
+    return {
+        "session": ("GET", "/api/session", None),
+        "campaigns": ("GET", "/api/campaigns", None),
+        "campaign_players": ("GET", "/api/campaigns/%d/players" % campaign_id, None),
+        "campaign_maps": ("GET", "/api/campaigns/%d/maps" % campaign_id, None),
+        "get_maps": ("POST", "/api/getmaps", {"campaign_id": campaign_id}),
+        "get_battlemaps": ("POST", "/api/getbattlemaps", {"campaign_id": campaign_id}),
+        "get_logs": ("POST", "/api/getlogs", {"campaign_code": CAMPAIGN_CODE}),
+        "get_messages": ("POST", "/api/getmessages", {"campaign_id": campaign_id}),
+        "player": ("GET", "/api/player/%d" % player_id, None),
+        "player_spells": ("GET", "/api/player/%d/spells" % player_id, None),
+        "player_items": ("GET", "/api/player/%d/items" % player_id, None),
+        "user_spells": ("GET", "/api/user/spells", None),
+        "user_items": ("GET", "/api/user/items", None),
+        "races": ("GET", "/api/races", None),
+        "classes": ("GET", "/api/classes", None),
+        "backgrounds": ("GET", "/api/backgrounds", None),
+    }
+
+
+def find_benchmark_data():
+    with app.app_context():
+        db = request_session()
+        campaign = db.query(CampaignModel).filter(CampaignModel.code == CAMPAIGN_CODE).first()
+        if campaign is None:
+            raise SystemExit("Campaign %s does not exist, fill the database with generate_data.py first."
+                             % CAMPAIGN_CODE)
+
+        player = db.query(PlayerModel).filter(PlayerModel.campaign_id == campaign.id) \
+            .order_by(PlayerModel.id).first()
+        if player is None:
+            raise SystemExit("Campaign %s has no players." % CAMPAIGN_CODE)
+
+        campaign_id, player_id = campaign.id, player.id
+        db.remove()
+    return campaign_id, player_id
+
+
+def request(client, method: str, url: str, body) -> int:
+    response = client.open(url, method=method, json=body)
+    if response.status_code != 200:
+        raise RuntimeError("%s %s failed with status %d" % (method, url, response.status_code))
+    return len(response.get_data())
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_scenario(client, method: str, url: str, body, args) -> dict:
+    for _ in range(args.warmup):
+        request(client, method, url, body)
+
+    latencies = []
+    _queries[0] = 0
+    size = 0
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        size = request(client, method, url, body)
+        latencies.append(time.perf_counter() - start)
+    queries = _queries[0] / args.iterations
+
+    allocated = []
+    tracemalloc.start()
+    for _ in range(max(1, args.iterations // 5)):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        request(client, method, url, body)
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries": queries,
+        "peak_kib": statistics.median(allocated) / 1024,
+        "response_bytes": size,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    :return: The regressions of the results against the baseline, as readable strings.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        if result["p50_ms"] > max(base["p50_ms"] * (1 + threshold), base["p50_ms"] + MIN_REGRESSION_MS):
+            regressions.append("%s: p50 %.2f ms, baseline %.2f ms" % (name, result["p50_ms"], base["p50_ms"]))
+        if result["queries"] > base["queries"]:
+            regressions.append("%s: %.1f queries, baseline %.1f" % (name, result["queries"], base["queries"]))
+    return regressions
+
+
+def main():
+    args = get_args()
+    campaign_id, player_id = find_benchmark_data()
+
+    scenarios = get_scenarios(campaign_id, player_id)
+    if args.scenario:
+        unknown = set(args.scenario) - set(scenarios)
+        if unknown:
+            raise SystemExit("Unknown scenarios: %s" % ", ".join(sorted(unknown)))
+        scenarios = {name: scenarios[name] for name in args.scenario}
+
+    client = app.test_client()
+    response = client.post("/api/login", json={"username": USERNAME, "password": PASSWORD})
+    if response.status_code != 200 or response.get_json().get("user") is None:
+        raise SystemExit("Could not log in as %s." % USERNAME)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    print("%-18s %10s %10s %8s %10s %10s" % ("scenario", "p50 ms", "p99 ms", "queries", "peak KiB", "bytes"))
+    results = {}
+    for name, (method, url, body) in scenarios.items():
+        result = results[name] = run_scenario(client, method, url, body, args)
+        line = "%-18s %10.2f %10.2f %8.1f %10.1f %10d" % (name, result["p50_ms"], result["p99_ms"],
+                                                         result["queries"], result["peak_kib"],
+                                                         result["response_bytes"])
+        if baseline is not None and name in baseline:
+            line += "  (%+.0f%%)" % ((result["p50_ms"] / baseline[name]["p50_ms"] - 1) * 100)
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"iterations": args.iterations, "results": results}, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("Regression " + regression)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
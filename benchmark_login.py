@@ -0,0 +1,114 @@
+"""
+Measures the login latency under concurrent load, and how long the event loop is blocked meanwhile.
+
+A heartbeat greenlet sleeps in short intervals during the logins; the largest delay of its wake ups is the
+longest time every other greenlet, such as the websockets, could not run. Run it with --inline to compare
+with hashing directly in the request handler.
+
+The benchmark logs in as the user `benchmark`, which is created in the configured database if needed.
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import statistics
+import time
+
+import gevent
+
+from lib.repository import user_repository
+from lib.service import user_service
+from lib.utils import password_utils
+from services.server import app
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark"
+
+# Interval of the heartbeat greenlet in seconds.
+HEARTBEAT = 0.005
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the login latency under concurrent load.")
+
+    parser.add_argument("--concurrency", type=int, default=8, help="Amount of simultaneous logins.")
+    parser.add_argument("--requests", type=int, default=32, help="Total amount of logins.")
+    parser.add_argument("--rounds", type=int, default=None, help="The bcrypt cost factor, defaults to the config.")
+    parser.add_argument("--inline", action="store_true",
+                        help="Hash in the request handler instead of the password pool, as before.")
+    return parser.parse_args()
+
+
+def ensure_user():
+    with app.app_context():
+        user = user_repository.find_user_by_name(USERNAME)
+        if user is None:
+            user_service.create_user(USERNAME, PASSWORD, "benchmark@localhost.local")
+        else:
+            user_service.set_password(user, PASSWORD)
+
+
+def login(client) -> float:
+    start = time.perf_counter()
+    response = client.post("/api/login", json={"username": USERNAME, "password": PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError("Login failed with status %d" % response.status_code)
+    return time.perf_counter() - start
+
+
+def worker(count: int, latencies: list):
+    client = app.test_client()
+    for _ in range(count):
+        latencies.append(login(client))
+
+
+def heartbeat(stalls: list):
+    while True:
+        start = time.perf_counter()
+        gevent.sleep(HEARTBEAT)
+        stalls.append(time.perf_counter() - start - HEARTBEAT)
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    args = get_args()
+
+    if args.rounds is not None:
+        password_utils.set_rounds(args.rounds)
+    if args.inline:
+        password_utils._run = lambda fn, *fn_args: fn(*fn_args)
+
+    ensure_user()
+
+    latencies = []
+    stalls = []
+    beat = gevent.spawn(heartbeat, stalls)
+    gevent.sleep(0)
+
+    per_worker = [args.requests // args.concurrency + (1 if i < args.requests % args.concurrency else 0)
+                  for i in range(args.concurrency)]
+
+    start = time.perf_counter()
+    gevent.joinall([gevent.spawn(worker, count, latencies) for count in per_worker if count > 0])
+    duration = time.perf_counter() - start
+
+    # Let the heartbeat record its last wake up.
+    gevent.sleep(HEARTBEAT * 2)
+    beat.kill()
+
+    print("Logins:          %d with concurrency %d (%s)"
+          % (len(latencies), args.concurrency, "inline" if args.inline else "password pool"))
+    print("Throughput:      %.1f logins/s" % (len(latencies) / duration))
+    print("Latency p50:     %.1f ms" % (statistics.median(latencies) * 1000))
+    print("Latency p99:     %.1f ms" % (percentile(latencies, 99) * 1000))
+    print("Latency max:     %.1f ms" % (max(latencies) * 1000))
+    print("Event loop stall max: %.1f ms" % (max(stalls, default=0) * 1000))
+
+
+if __name__ == "__main__":
+    main()
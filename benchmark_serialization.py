@@ -0,0 +1,102 @@
+"""
+Compares the serialization of the item and spell catalogs before and after the compiled serializers and the
+orjson provider, on models created in memory.
+
+The reflective serializer below is the former `JSONAble.to_json`, it is kept here as the reference; the
+benchmark fails when the outputs of both serializers or both encoders differ.
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import random
+import timeit
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from lib.model.models import ItemModel, SpellModel
+from lib.utils.json_provider import JSONProvider, orjson
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the serialization of the item and spell catalogs.")
+
+    parser.add_argument("--items", type=int, default=300, help="Amount of items in the catalog.")
+    parser.add_argument("--spells", type=int, default=400, help="Amount of spells in the catalog.")
+    parser.add_argument("--repeat", type=int, default=20, help="Amount of times every catalog is serialized.")
+    return parser.parse_args()
+
+
+def reflective_to_json(self, default_response=None):
+    if default_response is None:
+        response = {}
+    else:
+        response = copy.deepcopy(default_response)
+
+    for key in self.json_deferred:
+        getattr(self, key)
+
+    def _is_valid(k, v):
+        allowed_types = [str, int, bool, float, datetime, dict]
+        return (
+                not k.startswith("_") and
+                type(v) in allowed_types
+        )
+
+    response.update({k: v for k, v in self.__dict__.items() if _is_valid(k, v)})
+    return response
+
+
+def create_catalogs(args):
+    rng = random.Random(0)
+    items = [ItemModel(id=i, name="Item %d" % i, owner_id=None, category=rng.choice(["Weapon", "Armor"]),
+                       cost=rng.randint(1, 100000), weight=rng.randint(0, 50), description="An item " * 20,
+                       item_info={"damage": "1d8", "properties": ["versatile", "finesse"]})
+             for i in range(args.items)]
+    spells = [SpellModel(id=i, name="Spell %d" % i, owner_id=-1, description="A spell " * 60, level=rng.randint(0, 9),
+                         spell_range="60 feet", components="V, S, M", material="A pinch of dust", ritual=False,
+                         concentration=rng.random() < 0.3, duration="1 minute", casting_time="1 action",
+                         school="Evocation")
+              for i in range(args.spells)]
+    return {"items": items, "spells": spells}
+
+
+def measure(function, repeat: int) -> float:
+    """
+    :return: The best time of a single call in milliseconds.
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    args = get_args()
+    app = Flask("benchmark")
+    default_provider = DefaultJSONProvider(app)
+    provider = JSONProvider(app)
+
+    if orjson is None:
+        print("orjson is not installed, the provider uses the default encoder.")
+
+    print("%-8s %22s %22s %22s" % ("catalog", "to_json ms (before)", "to_json ms (after)", "encode ms (before/after)"))
+    for name, models in create_catalogs(args).items():
+        before = [reflective_to_json(model) for model in models]
+        after = [model.to_json() for model in models]
+        if before != after:
+            raise SystemExit("The compiled serializer changed the output of the %s." % name)
+        if json.loads(default_provider.dumps(after)) != json.loads(provider.dumps(after)):
+            raise SystemExit("The provider changed the output of the %s." % name)
+
+        reflective = measure(lambda: [reflective_to_json(model) for model in models], args.repeat)
+        compiled = measure(lambda: [model.to_json() for model in models], args.repeat)
+        default_encode = measure(lambda: default_provider.dumps(after, separators=(",", ":")), args.repeat)
+        encode = measure(lambda: provider.dumps(after, separators=(",", ":")), args.repeat)
+
+        print("%-8s %22.2f %22.2f %15.2f / %.2f   (%.1fx total)"
+              % (name, reflective, compiled, default_encode, encode,
+                 (reflective + default_encode) / (compiled + encode)))
+
+
+if __name__ == "__main__":
+    main()
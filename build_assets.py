@@ -0,0 +1,35 @@
+"""
+Creates the fingerprinted copies of the static assets, their .br and .gz variants and the asset manifest.
+Run it after building the client with webpack, and restart the server to use the new manifest.
+
+The .br variants are only created when the brotli package is installed.
+"""
+
+import argparse
+import os
+
+from lib.utils import static_assets
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services", "client", "public", "static")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the static assets.")
+
+    parser.add_argument("--static", type=str, default=STATIC_FOLDER, help="The static folder of the client.")
+    parser.add_argument("--min-size", type=int, default=256, help="Assets smaller than this are not compressed.")
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    manifest = static_assets.build_manifest(args.static, args.min_size)
+    for filename, asset in sorted(manifest["assets"].items()):
+        print("%s -> %s %s" % (filename, asset["file"], " ".join(asset["encodings"])))
+    if static_assets.brotli is None:
+        print("brotli is not installed, only .gz variants were created.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Fills a scratch database with synthetic campaigns, at a configurable scale, through the models of the server.
+Set CONFIG_FILE to a config which points to a scratch database, the generator refuses to add to a database
+which already has users unless --force is given.
+
+Every generated user is named user<n> with the password `password`, user0 is the dungeon master of the
+first campaign. benchmark_endpoints.py uses this data.
+"""
+
+import argparse
+import datetime
+import json
+import random
+
+import bcrypt
+
+from lib.database import request_session
+from lib.model.class_models import ClassModel
+from lib.model.models import UserModel, CampaignModel, PlayerModel, MapModel, LogModel, MessageModel, \
+    ItemModel, SpellModel, PlayerEquipmentModel, PlayerSpellModel
+from services.server import app
+
+PASSWORD = "password"
+
+BATCH_SIZE = 1000
+
+WORDS = ["goblin", "dragon", "tavern", "sword", "forest", "castle", "ranger", "potion", "dungeon", "wizard",
+         "shadow", "river", "crown", "ember", "frost", "whisper", "ancient", "silver", "storm", "oath"]
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Fill a scratch database with synthetic campaign data.")
+
+    parser.add_argument("--users", type=int, default=50, help="Amount of users.")
+    parser.add_argument("--campaigns", type=int, default=10, help="Amount of campaigns.")
+    parser.add_argument("--players", type=int, default=6, help="Players per campaign.")
+    parser.add_argument("--map-depth", type=int, default=3, help="Depth of the map tree of every campaign.")
+    parser.add_argument("--map-children", type=int, default=4, help="Child maps per map.")
+    parser.add_argument("--logs", type=int, default=500, help="Logs per campaign.")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per campaign.")
+    parser.add_argument("--items", type=int, default=300, help="Amount of base items.")
+    parser.add_argument("--spells", type=int, default=400, help="Amount of base spells.")
+    parser.add_argument("--classes", type=int, default=12, help="Amount of base classes.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+    parser.add_argument("--force", action="store_true", help="Add to a database which already has users.")
+    return parser.parse_args()
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def save(models: list) -> list:
+    """
+    Inserts the models and returns their ids, as the models are expired after the commit.
+    """
+    db = request_session()
+    for i in range(0, len(models), BATCH_SIZE):
+        db.add_all(models[i:i + BATCH_SIZE])
+        db.flush()
+
+    ids = [model.id for model in models]
+    db.commit()
+    return ids
+
+
+def create_reference_data(args, rng: random.Random):
+    items = [ItemModel(name="%s %d" % (text(rng, 2), i), owner_id=None, category=rng.choice(["Weapon", "Armor"]),
+                       cost=rng.randint(1, 100000), weight=rng.randint(0, 50), description=text(rng, 30))
+             for i in range(args.items)]
+    spells = [SpellModel(name="%s %d" % (text(rng, 2), i), owner_id=-1, description=text(rng, 120),
+                         level=rng.randint(0, 9), spell_range="%d feet" % rng.randint(5, 120), components="V, S",
+                         ritual=rng.random() < 0.1, concentration=rng.random() < 0.3, duration="1 minute",
+                         casting_time="1 action", school=rng.choice(WORDS))
+              for i in range(args.spells)]
+    classes = [ClassModel(name="%s %d" % (text(rng, 1), i),
+                          data=json.dumps({"hit_die": 8, "class_levels": [{"level": level, "features": text(rng, 40)}
+                                                                         for level in range(1, 21)]}))
+               for i in range(args.classes)]
+
+    save(classes)
+    return save(items), save(spells)
+
+
+def create_users(args) -> list:
+    # Hash once with a low cost factor, the cost is upgraded when the user logs in.
+    password = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4))
+    users = [UserModel(name="user%d" % i, email="user%d@example.local" % i, password=password)
+             for i in range(args.users)]
+    return save(users)
+
+
+def create_map_tree(args, rng: random.Random, campaign_id: int):
+    level = save([MapModel(campaign_id=campaign_id, name="World", story=text(rng, 200))])
+
+    for _ in range(args.map_depth):
+        level = save([MapModel(campaign_id=campaign_id, parent_map_id=parent_id, name=text(rng, 2),
+                               x=rng.randint(0, 1000), y=rng.randint(0, 1000), story=text(rng, 200))
+                      for parent_id in level for _ in range(args.map_children)])
+
+
+def create_campaign(args, rng: random.Random, index: int, user_ids: list, item_ids: list, spell_ids: list):
+    (campaign_id,) = save([CampaignModel(user_id=user_ids[index % len(user_ids)], name="Campaign %d" % index,
+                                         code="BENCH%d" % index)])
+
+    players = []
+    for i in range(args.players):
+        player = PlayerModel(campaign_id=campaign_id, name=text(rng, 2).title(), backstory=text(rng, 100),
+                             gold=rng.randint(0, 500))
+        player.owner_id = user_ids[(index + i + 1) % len(user_ids)]
+        players.append(player)
+    player_ids = save(players)
+
+    equipment = [PlayerEquipmentModel(player_id=player_id, item_id=item_id, amount=rng.randint(1, 3))
+                 for player_id in player_ids for item_id in rng.sample(item_ids, min(10, len(item_ids)))]
+    player_spells = [PlayerSpellModel(player_id=player_id, spell_id=spell_id)
+                     for player_id in player_ids for spell_id in rng.sample(spell_ids, min(10, len(spell_ids)))]
+    save(equipment + player_spells)
+
+    create_map_tree(args, rng, campaign_id)
+
+    start = datetime.datetime.now() - datetime.timedelta(days=365)
+    logs = [LogModel(campaign_id=campaign_id, creator_id=rng.choice(player_ids) if player_ids else None,
+                     title=text(rng, 4), text=text(rng, 80), time=start + datetime.timedelta(hours=i))
+            for i in range(args.logs)]
+    messages = [MessageModel(campaign_id=campaign_id, sender_id=rng.choice(player_ids) if player_ids else None,
+                             message=text(rng, 10), time=start + datetime.timedelta(minutes=i))
+                for i in range(args.messages)]
+    save(logs + messages)
+
+
+def main():
+    args = get_args()
+    rng = random.Random(args.seed)
+
+    db = request_session()
+    if db.query(UserModel.id).first() is not None and not args.force:
+        raise SystemExit("The database already has users, use a scratch database or pass --force.")
+
+    print("Creating reference data")
+    item_ids, spell_ids = create_reference_data(args, rng)
+
+    print("Creating %d users" % args.users)
+    user_ids = create_users(args)
+
+    for i in range(args.campaigns):
+        print("Creating campaign %d/%d" % (i + 1, args.campaigns))
+        create_campaign(args, rng, i, user_ids, item_ids, spell_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Load tests the socket rooms of a running server, to find how many players a single worker can serve.
+
+For every room size, --rooms rooms are filled with Socket.IO clients. Every client logs in through /api/login,
+joins its room and then sends chat messages and token moves at the given rates. The fan-out latency from sending
+an event until every member of the room received it, the dropped events and the CPU use of the server are
+recorded per room size.
+
+Start the server with run.py, or let the load test start it with --start-server, and fill its database with
+generate_data.py so the users user<n> exist. The server CPU is read from /proc, so it is only measured on Linux
+for a local server.
+
+Moves replace the token of the sender, and the server coalesces the replacements of a frame. A move therefore
+only counts as dropped when a client never received it or a later move of the same token.
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import gevent
+import requests
+from gevent.event import Event
+import socketio
+
+PASSWORD = "password"
+
+# Every chat message of the load test starts with this marker, followed by the client, sequence and send time.
+MARKER = "loadtest"
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Load test the socket rooms of a running server.")
+
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Url of the server.")
+    parser.add_argument("--room-sizes", default="5,20,50", help="Comma separated clients per room to test.")
+    parser.add_argument("--rooms", type=int, default=4, help="Amount of rooms per room size.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of traffic per room size.")
+    parser.add_argument("--drain", type=float, default=2, help="Seconds to wait for events after the traffic.")
+    parser.add_argument("--message-rate", type=float, default=0.2, help="Chat messages per client per second.")
+    parser.add_argument("--update-rate", type=float, default=2, help="Token moves per client per second.")
+    parser.add_argument("--users", type=int, default=50, help="Amount of generated users to log in as.")
+    parser.add_argument("--server-pid", type=int, help="Process id of the server, to measure its CPU use.")
+    parser.add_argument("--start-server", action="store_true", help="Start run.py on the port of --url.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    return parser.parse_args()
+
+
+class LoadClient:
+    def __init__(self, index: int, room: str, url: str, username: str):
+        self.index = index
+        self.room = room
+        self.url = url
+        self.username = username
+        self.token = "token_%d" % index
+
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=False, http_session=self.http)
+        self.sio.on("message", self.on_message)
+        self.sio.on("update", self.on_update)
+        self.sio.on("snapshot", self.on_snapshot)
+
+        # Latencies of the received events in seconds, and per sender the sequence numbers seen.
+        self.message_latencies = []
+        self.update_latencies = []
+        self.messages_seen = set()
+        self.last_update_seen = {}
+        self.joined = Event()
+
+        self.messages_sent = 0
+        self.updates_sent = 0
+
+    def connect(self):
+        response = self.http.post(self.url + "/api/login", json={"username": self.username, "password": PASSWORD})
+        if response.status_code != 200 or response.json().get("user") is None:
+            raise RuntimeError("Could not log in as %s (status %d)" % (self.username, response.status_code))
+
+        self.sio.connect(self.url)
+        self.sio.emit("join", {"campaign": self.room})
+        if not self.joined.wait(30):
+            raise RuntimeError("%s did not receive a snapshot of %s" % (self.username, self.room))
+
+    def on_snapshot(self, data):
+        self.joined.set()
+
+    def on_message(self, data):
+        received = time.perf_counter()
+        if isinstance(data, str):
+            data = json.loads(data)
+
+        # Messages are broadcast as "<name>: <text>".
+        text = data.get("message", "").split(": ", 1)[-1].split(" ")
+        if len(text) != 4 or text[0] != MARKER:
+            return
+
+        self.messages_seen.add((int(text[1]), int(text[2])))
+        self.message_latencies.append(received - float(text[3]))
+
+    def on_update(self, frame):
+        received = time.perf_counter()
+        for operation in frame.get("patch", []):
+            value = operation.get("value")
+            if not isinstance(value, dict) or "sent" not in value:
+                continue
+
+            sender = value["client"]
+            if value["seq"] > self.last_update_seen.get(sender, -1):
+                self.last_update_seen[sender] = value["seq"]
+            self.update_latencies.append(received - value["sent"])
+
+    def send_message(self):
+        message = "%s %d %d %r" % (MARKER, self.index, self.messages_sent, time.perf_counter())
+        self.sio.emit("message", {"campaign": self.room, "message": message})
+        self.messages_sent += 1
+
+    def send_update(self):
+        value = {"client": self.index, "seq": self.updates_sent, "sent": time.perf_counter(),
+                 "x": random.randint(0, 1000), "y": random.randint(0, 1000)}
+        op = "add" if self.updates_sent == 0 else "replace"
+        self.sio.emit("update", {"campaign": self.room, "patch": [{"op": op, "path": "/" + self.token,
+                                                                   "value": value}]})
+        self.updates_sent += 1
+
+    def run(self, duration: float, message_rate: float, update_rate: float):
+        """
+        Sends messages and updates as Poisson processes with the given rates, for the given seconds.
+        """
+        end = time.perf_counter() + duration
+        next_message = time.perf_counter() + random.expovariate(message_rate) if message_rate > 0 else end
+        next_update = time.perf_counter() + random.expovariate(update_rate) if update_rate > 0 else end
+
+        while True:
+            next_event = min(next_message, next_update)
+            if next_event >= end:
+                break
+            gevent.sleep(max(0.0, next_event - time.perf_counter()))
+
+            if next_message <= next_update:
+                self.send_message()
+                next_message += random.expovariate(message_rate)
+            else:
+                self.send_update()
+                next_update += random.expovariate(update_rate)
+
+    def disconnect(self):
+        try:
+            self.sio.disconnect()
+        finally:
+            self.http.close()
+
+
+def server_cpu_seconds(pid: int):
+    """
+    :return: The user and system CPU time of the process in seconds, or None if it can not be read.
+    """
+    try:
+        with open("/proc/%d/stat" % pid) as f:
+            # The command name may contain spaces, the fields after it are fixed.
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def summarize(latencies: list) -> dict:
+    if len(latencies) == 0:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(round(0.99 * (len(latencies) - 1))))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def run_room_size(args, size: int) -> dict:
+    rooms = [[] for _ in range(args.rooms)]
+    for room_index, members in enumerate(rooms):
+        room = "loadtest-%d-%d-%d" % (size, room_index, os.getpid())
+        for i in range(size):
+            index = room_index * size + i
+            members.append(LoadClient(index, room, args.url, "user%d" % (index % args.users)))
+    clients = [client for members in rooms for client in members]
+
+    connect_start = time.perf_counter()
+    gevent.joinall([gevent.spawn(client.connect) for client in clients], raise_error=True)
+    connect_time = time.perf_counter() - connect_start
+
+    cpu_start = server_cpu_seconds(args.server_pid) if args.server_pid else None
+    start = time.perf_counter()
+    gevent.joinall([gevent.spawn(client.run, args.duration, args.message_rate, args.update_rate)
+                    for client in clients], raise_error=True)
+    traffic_time = time.perf_counter() - start
+    cpu_end = server_cpu_seconds(args.server_pid) if args.server_pid else None
+
+    gevent.sleep(args.drain)
+
+    messages_expected = messages_dropped = updates_expected = updates_dropped = 0
+    for members in rooms:
+        for receiver in members:
+            for sender in members:
+                messages_expected += sender.messages_sent
+                messages_dropped += sum(1 for seq in range(sender.messages_sent)
+                                        if (sender.index, seq) not in receiver.messages_seen)
+
+                if sender.updates_sent > 0:
+                    updates_expected += 1
+                    if receiver.last_update_seen.get(sender.index, -1) < sender.updates_sent - 1:
+                        updates_dropped += 1
+
+    gevent.joinall([gevent.spawn(client.disconnect) for client in clients])
+
+    cpu = None
+    if cpu_start is not None and cpu_end is not None:
+        cpu = (cpu_end - cpu_start) / traffic_time
+
+    return {
+        "room_size": size,
+        "rooms": args.rooms,
+        "clients": len(clients),
+        "connect_seconds": connect_time,
+        "traffic_seconds": traffic_time,
+        "messages_sent": sum(client.messages_sent for client in clients),
+        "updates_sent": sum(client.updates_sent for client in clients),
+        "message_latency": summarize([latency for client in clients for latency in client.message_latencies]),
+        "update_latency": summarize([latency for client in clients for latency in client.update_latencies]),
+        "messages_expected": messages_expected,
+        "messages_dropped": messages_dropped,
+        "updates_expected": updates_expected,
+        "updates_dropped": updates_dropped,
+        "server_cpu": cpu,
+    }
+
+
+def start_server(url: str) -> subprocess.Popen:
+    port = url.rsplit(":", 1)[-1].split("/")[0]
+    run = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py")
+    server = subprocess.Popen([sys.executable, run, "--port", port])
+
+    for _ in range(300):
+        try:
+            requests.get(url + "/", timeout=1)
+            return server
+        except requests.ConnectionError:
+            if server.poll() is not None:
+                raise SystemExit("The server exited with status %d" % server.returncode)
+            time.sleep(0.1)
+
+    server.terminate()
+    raise SystemExit("The server did not start")
+
+
+def main():
+    args = get_args()
+    sizes = [int(size) for size in args.room_sizes.split(",")]
+
+    server = None
+    if args.start_server:
+        server = start_server(args.url)
+        args.server_pid = server.pid
+
+    results = []
+    try:
+        for size in sizes:
+            result = run_room_size(args, size)
+            results.append(result)
+
+            cpu = "%.0f%%" % (result["server_cpu"] * 100) if result["server_cpu"] is not None else "n/a"
+            print("%d rooms of %d clients: messages p50 %s ms p99 %s ms, %d/%d dropped; "
+                  "moves p50 %s ms p99 %s ms, %d/%d dropped; server CPU %s"
+                  % (result["rooms"], size, _ms(result["message_latency"]["p50_ms"]),
+                     _ms(result["message_latency"]["p99_ms"]), result["messages_dropped"],
+                     result["messages_expected"], _ms(result["update_latency"]["p50_ms"]),
+                     _ms(result["update_latency"]["p99_ms"]), result["updates_dropped"],
+                     result["updates_expected"], cpu))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "duration": args.duration, "message_rate": args.message_rate,
+                       "update_rate": args.update_rate, "results": results}, f, indent=2)
+
+
+def _ms(value) -> str:
+    return "%.1f" % value if value is not None else "n/a"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Moves the drawn images of editor maps out of the `created_map` table into the blob store.
+The blob columns are added to an existing `created_map` table first, so it can be run on old databases.
+Maps are migrated one at a time, it is safe to stop the migration and run it again.
+"""
+
+from sqlalchemy import inspect, text
+
+from lib.database import request_session
+from lib.repository import map_repository
+from lib.service import map_service
+from services.server import app
+
+BLOB_COLUMNS = {
+    "blob_hash": "VARCHAR(64)",
+    "blob_size": "INTEGER",
+    "mime_type": "VARCHAR",
+    "width": "INTEGER",
+    "height": "INTEGER",
+}
+
+
+def add_blob_columns():
+    db = request_session()
+    engine = db.get_bind()
+
+    existing = {column["name"] for column in inspect(engine).get_columns("created_map")}
+    for name, column_type in BLOB_COLUMNS.items():
+        if name not in existing:
+            print("Adding column created_map.%s" % name)
+            db.execute(text("ALTER TABLE created_map ADD COLUMN %s %s" % (name, column_type)))
+    db.commit()
+
+
+def migrate_editor_maps():
+    db = request_session()
+
+    map_ids = map_repository.get_editor_maps_to_migrate()
+    print("Migrating %d editor maps to %s" % (len(map_ids), app.blob_storage))
+
+    migrated = 0
+    for map_id in map_ids:
+        editor_map = map_repository.get_editor_map(map_id)
+        try:
+            map_service.store_editor_map_image(editor_map, editor_map.map_base64)
+        except ValueError as e:
+            print("Skipping editor map %d: %s" % (map_id, e))
+            continue
+
+        db.commit()
+        # Do not keep the migrated images in memory.
+        db.expunge(editor_map)
+        migrated += 1
+
+    print("Migrated %d editor maps. Run VACUUM on SQLite databases to reclaim the freed space." % migrated)
+
+
+def main():
+    add_blob_columns()
+    migrate_editor_maps()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,88 @@
+import argparse
+import hashlib
 import json
 import os
-import pprint
-import re
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Set
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import or_
 
 from lib.database import request_session
-from lib.model.class_models import ClassModel, ClassAbilityModel, SubclassModel
+from lib.model.class_models import ClassModel
 from lib.model.models import ItemModel, SpellModel, RaceModel, BackgroundModel
-from lib.repository import player_repository, repository
+from lib.utils import reference_cache
 from services.server import app
 
+DND5E_API = "https://www.dnd5eapi.co"
+OPEN5E_API = "https://api.open5e.com"
+
+# Amount of models inserted per transaction, a crashed import continues after the last committed batch.
+BATCH_SIZE = 100
+
+
+class ApiClient:
+    """
+    A pooled HTTP client for the dnd api's, which fetches concurrently and caches every response on disk.
+
+    Responses are stored as `<cache_dir>/<host>/<path>.json`, so a directory with this layout can also be
+    used as an offline fixture directory. Runs are resumable, responses which are cached are not fetched again.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, offline: bool = False, max_workers: int = 8):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.max_workers = max_workers
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, max_retries=3)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _cache_path(self, url: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+
+        parsed = urlparse(url)
+        path = parsed.path.strip("/") or "index"
+        if parsed.query:
+            path += "_" + hashlib.sha1(parsed.query.encode()).hexdigest()[:10]
+        return os.path.join(self.cache_dir, parsed.netloc, path + ".json")
+
+    def get(self, url: str) -> dict:
+        cache_path = self._cache_path(url)
+        if cache_path is not None and os.path.isfile(cache_path):
+            with open(cache_path, "r", encoding="utf8") as f:
+                return json.load(f)
+
+        if self.offline:
+            raise FileNotFoundError("No cached response for %s in %s" % (url, self.cache_dir))
+
+        response = self.session.get(url, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+
+        if cache_path is not None:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, "w", encoding="utf8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, cache_path)
+
+        return data
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """
+        Applies fn to every item with at most `max_workers` concurrent requests, preserving the order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fn, items))
+
+    def get_many(self, urls: Iterable[str]) -> List[dict]:
+        return self.map(self.get, urls)
+
 
 def convert_copper(obj):
     if obj["unit"] == "gp":
@@ -22,17 +93,35 @@ def convert_copper(obj):
         return obj["quantity"]
 
 
-def get_equipment():
-    result = requests.get("http://www.dnd5eapi.co/api/equipment/")
-    obj = result.json()
+def _existing_names(model_cls) -> Set[str]:
+    """
+    Returns the names of the base game models (without owner) which are already imported.
+    """
+    db = request_session()
+    return {name for (name,) in db.query(model_cls.name)
+            .filter(or_(model_cls.owner_id.is_(None), model_cls.owner_id == -1))
+            .all()}
+
+
+def _bulk_insert(models: List):
     db = request_session()
+    for i in range(0, len(models), BATCH_SIZE):
+        db.bulk_save_objects(models[i:i + BATCH_SIZE])
+        db.commit()
+    print("Inserted %d rows." % len(models))
 
-    for elem in obj["results"]:
-        # item = requests.get("http://www.dnd5eapi.co/api/equipment/dagger").json()
-        item = requests.get("http://www.dnd5eapi.co" + elem["url"]).json()
 
+def get_equipment(client: ApiClient):
+    obj = client.get(DND5E_API + "/api/equipment/")
+    existing = _existing_names(ItemModel)
+
+    results = [elem for elem in obj["results"] if elem["name"] not in existing]
+    items = client.get_many(DND5E_API + elem["url"] for elem in results)
+
+    models = []
+    for item in items:
         # All unknown elements will return None instead of error.
-        item_model = ItemModel(item["name"])
+        item_model = ItemModel(name=item["name"], owner_id=None)
 
         item_model.category = item["equipment_category"]["name"]
         item_model.cost = convert_copper(item["cost"])
@@ -42,21 +131,22 @@ def get_equipment():
         if item_model.category == "Adventuring Gear":
             item_model.gear_category = item["gear_category"]
 
-        db.add(item_model)
-        db.commit()
+        models.append(item_model)
 
-        db.commit()
+    _bulk_insert(models)
 
 
-def get_spells():
-    result = requests.get("http://www.dnd5eapi.co/api/spells/")
-    obj = result.json()
+def get_spells(client: ApiClient):
+    obj = client.get(DND5E_API + "/api/spells/")
+    existing = _existing_names(SpellModel)
 
-    for elem in obj["results"]:
-        spell = requests.get("http://www.dnd5eapi.co" + elem["url"]).json()
+    results = [elem for elem in obj["results"] if elem["name"] not in existing]
+    spells = client.get_many(DND5E_API + elem["url"] for elem in results)
 
+    models = []
+    for spell in spells:
         spell_model = SpellModel(
-            campaign_id=-1,
+            owner_id=-1,
             name=spell["name"])
 
         description = ""
@@ -78,7 +168,10 @@ def get_spells():
         spell_model.higher_level = "\n".join([text for text in spell.get("higher_level", [])])
 
         spell_model.school = spell["school"]["name"]
-        repository.add_and_commit(spell_model)
+        models.append(spell_model)
+
+    _bulk_insert(models)
+    reference_cache.invalidate(reference_cache.SPELLS)
 
 
 def clean_object(data):
@@ -95,41 +188,45 @@ def clean_object(data):
         return data
 
 
-def get_classes():
-    results = requests.get("https://www.dnd5eapi.co/api/classes").json()
-    db = request_session()
-    for result in results["results"]:
-        data = requests.get("https://www.dnd5eapi.co" + result["url"]).json()
+def _fetch_class(client: ApiClient, url: str) -> dict:
+    data = client.get(DND5E_API + url)
+
+    eq = client.get(DND5E_API + data["starting_equipment"]["url"])
+    data.update(clean_object(eq))
+
+    eq = client.get(DND5E_API + data["class_levels"]["url"])
+    data["class_levels"] = clean_object(eq)
 
-        eq = requests.get("https://www.dnd5eapi.co" + data["starting_equipment"]["url"]).json()
-        data.update(clean_object(eq))
+    if "spellcasting" in data:
+        eq = client.get(DND5E_API + data["spellcasting"]["url"])
+        data["spellcasting"] = clean_object(eq)
 
-        eq = requests.get("https://www.dnd5eapi.co" + data["class_levels"]["url"]).json()
-        data["class_levels"] = clean_object(eq)
+    return data
 
-        if "spellcasting" in data:
-            eq = requests.get("https://www.dnd5eapi.co" + data["spellcasting"]["url"]).json()
-            data["spellcasting"] = clean_object(eq)
 
+def get_classes(client: ApiClient):
+    results = client.get(DND5E_API + "/api/classes")
+    existing = _existing_names(ClassModel)
+
+    urls = [result["url"] for result in results["results"] if result["name"] not in existing]
+    classes = client.map(lambda url: _fetch_class(client, url), urls)
+
+    models = []
+    for data in classes:
         clean_data = clean_object(data)
         del clean_data["name"]
-        clean_data = json.dumps(clean_data)
 
-        class_model = ClassModel()
-        class_model.name = data["name"]
-        class_model.data = clean_data
+        models.append(ClassModel(name=data["name"], data=json.dumps(clean_data)))
 
-        db.add(class_model)
-    db.commit()
+    _bulk_insert(models)
+    reference_cache.invalidate(reference_cache.CLASSES)
 
 
-def get_table():
-    result = requests.get("http://api.open5e.com/classes/")
-    obj = result.json()
+def get_table(client: ApiClient):
+    obj = client.get(OPEN5E_API + "/classes/")
 
     db = request_session()
 
-    from typing import List
     models: List[ClassModel] = db.query(ClassModel).all()
 
     for result in obj['results']:
@@ -149,13 +246,18 @@ def get_table():
         model.table = str(data)
 
     db.commit()
+    reference_cache.invalidate(reference_cache.CLASSES)
 
 
-def get_races():
-    result = requests.get("http://api.open5e.com/races/")
-    obj = result.json()
+def get_races(client: ApiClient):
+    obj = client.get(OPEN5E_API + "/races/")
+    existing = _existing_names(RaceModel)
 
+    models = []
     for result in obj['results']:
+        if result.get("name") in existing:
+            continue
+
         racemodel = RaceModel(owner_id=None)
         racemodel.name = result.get("name")
         racemodel.desc = result.get("desc")
@@ -167,18 +269,24 @@ def get_races():
         racemodel.languages = result.get("languages")
         racemodel.vision = result.get("vision")
         racemodel.traits = result.get("traits")
-        repository.add_and_commit(racemodel)
+        models.append(racemodel)
 
         # TODO handle subraces, asi, asi_desc and traits better
 
+    _bulk_insert(models)
+    reference_cache.invalidate(reference_cache.RACES)
 
-def get_backgrounds():
-    result = requests.get("https://api.open5e.com/backgrounds/")
-    obj = result.json()
-    db = request_session()
 
+def get_backgrounds(client: ApiClient):
+    obj = client.get(OPEN5E_API + "/backgrounds/")
+    existing = _existing_names(BackgroundModel)
+
+    models = []
     for result in obj["results"]:
-        background_model = BackgroundModel(result.get("name"))
+        if result.get("name") in existing:
+            continue
+
+        background_model = BackgroundModel(name=result.get("name"), owner_id=None)
 
         background_model.desc = result.get("desc")
         background_model.skills = result.get("skill_proficiencies")
@@ -188,11 +296,13 @@ def get_backgrounds():
         background_model.feature = result.get("feature")
         background_model.feature_desc = result.get("feature_desc")
 
-        db.add(background_model)
-    db.commit()
+        models.append(background_model)
+
+    _bulk_insert(models)
+    reference_cache.invalidate(reference_cache.BACKGROUNDS)
 
 
-def fix_description():
+def fix_description(client: ApiClient = None):
     db = request_session()
     items = db.query(ItemModel).all()
     for item in items:
@@ -207,16 +317,43 @@ def fix_description():
             item.item_info = dict()
     db.commit()
 
+
+IMPORTERS = {
+    "equipment": get_equipment,
+    "spells": get_spells,
+    "classes": get_classes,
+    "table": get_table,
+    "races": get_races,
+    "backgrounds": get_backgrounds,
+    "fix_description": fix_description,
+}
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Import the base game data from the dnd api's.")
+
+    parser.add_argument("importers", nargs="*",
+                        help="The importers to run, in order. Runs all importers by default. "
+                             "Choose from: %s" % ", ".join(IMPORTERS.keys()))
+    parser.add_argument("--cache", type=str, default="storage/api_cache",
+                        help="Directory in which the api responses are cached.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only use the responses in the cache directory, for example a fixture directory.")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum amount of concurrent requests.")
+    return parser.parse_args()
+
+
 def main():
-    # get_equipment()
-    # get_spells()
-    # get_classes()
-    # get_table()
-    # get_races()
-    # get_backgrounds()
-
-    fix_description()
-    pass
+    args = get_args()
+    for name in args.importers:
+        if name not in IMPORTERS:
+            raise SystemExit("Unknown importer %s, choose from: %s" % (name, ", ".join(IMPORTERS.keys())))
+
+    client = ApiClient(cache_dir=args.cache, offline=args.offline, max_workers=args.workers)
+
+    for name in args.importers or IMPORTERS.keys():
+        print("Importing %s" % name)
+        IMPORTERS[name](client)
 
 
 if __name__ == "__main__":
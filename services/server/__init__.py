@@ -16,25 +16,43 @@ def create_app(config) -> Flask:
     app = Flask(__name__, template_folder='../client/public',
                 static_folder='../client/public/static')
 
+    from lib.utils.json_provider import JSONProvider
+    app.json = JSONProvider(app)
+
     app_section = config['app']
     app.config['DEBUG'] = app_section.getboolean('debug')
     app.port = app_section['port']
     app.host = app_section['host']
     app.database_name = 'database.db'
     app.map_storage = 'services/client/public/static/images/uploads/'
+    app.blob_storage = 'storage/blobs/'
 
     app.secret_key = app_section['secret'].encode()
+    app.bcrypt_rounds = app_section.getint('bcrypt_rounds', fallback=12)
 
     email_section = config['email']
     app.email_server = email_section['server']
     app.email_address = email_section['address']
     app.email_password = email_section['password']
+    app.email_transport = email_section.get('transport', 'smtp')
 
     return app
 
 
+def create_socketio(app, message_queue=None) -> SocketIO:
+    if not message_queue:
+        return SocketIO(app)
+
+    from lib.utils.socket_queue import create_client_manager
+    client_manager = create_client_manager(message_queue)
+    if client_manager is not None:
+        return SocketIO(app, client_manager=client_manager)
+    return SocketIO(app, message_queue=message_queue)
+
+
 def setup_directories():
     os.makedirs('storage', exist_ok=True)
+    os.makedirs('storage/blobs', exist_ok=True)
     os.makedirs("services/client/public/static/images/uploads/", exist_ok=True)
 
 
@@ -56,14 +74,17 @@ def init():
 
     app = create_app(config_parser)
 
+    from lib.utils import password_utils
+    password_utils.set_rounds(app.bcrypt_rounds)
+
     # I dont care about cross origin requests
     CORS(app)
 
     # Wrap app in JSON response to parse exceptions to JSON instead of HTML.
     handler = JSONExceptionHandler(app)
 
-    # Wrap app in socketIO to support socket communication
-    socketio = SocketIO(app)
+    # Wrap app in socketIO to support socket communication, a message queue is required to run multiple workers.
+    socketio = create_socketio(app, config_parser['app'].get('message_queue'))
 
     # Import blueprints
     from endpoints import api
@@ -71,15 +92,29 @@ def init():
 
     # Import views to automatically set up routes.
     import views.index
+    import views.static
+    import views.metrics
 
     # Import database and set it up.
     import lib.database
     lib.database.register_teardown(app)
-    lib.database.init_db(config_parser['database']['url'])
+    lib.database.init_db(config_parser['database']['url'], config_parser['database'])
 
     # Create model
     lib.database.metadata_create_all()
 
+    # Load the base game data from a reference data snapshot, tables which are up to date are skipped.
+    snapshot = config_parser['database'].get('snapshot')
+    if snapshot and os.path.isfile(snapshot):
+        from lib.service import snapshot_service
+        for table, status in snapshot_service.load_snapshot(snapshot).items():
+            print('Snapshot %s: %s' % (table, status))
+        lib.database.request_session().remove()
+
+    # Send the emails of the outbox in the background, including those left over from earlier runs.
+    from lib.service import email_service
+    email_service.start_sender()
+
     print('Setup done.')
 
 
@@ -1,27 +1,134 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
 from functools import wraps
 
 from werkzeug.exceptions import BadRequest, Unauthorized
 
 from lib import user_session
+from lib.repository import repository
+from lib.utils import compression, metrics, reference_cache
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
 
+@api.before_request
+def start_metrics():
+    metrics.start_measurement()
+
+
+@api.after_request
+def record_metrics(response):
+    route = request.url_rule.rule if request.url_rule is not None else "unknown"
+    metrics.record_request(route, request.method, response.status_code, response.content_length or 0)
+    return response
+
+
 def json_api():
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             res = f(*args, **kwargs)
+            if isinstance(res, Response):
+                return res
             if type(res) == tuple:
-                return jsonify(res[0]), res[1]
-            return jsonify(res)
+                response = jsonify(res[0])
+                response.status_code = res[1]
+            else:
+                response = jsonify(res)
+            return compress_response(response)
 
         return decorated_function
 
     return decorator
 
 
+def cached_json_response(payload):
+    """
+    Creates a response for a payload from the reference cache.
+    The response carries a strong ETag, and is answered with a 304 if the client already has this version.
+
+    :param payload: A `CachedPayload` from `lib.utils.reference_cache`.
+    """
+    body = payload.body
+    etag = payload.etag
+
+    encoding = None
+    if len(body) >= compression.MIN_SIZE:
+        encoding = compression.choose_encoding(request.accept_encodings)
+    if encoding is not None:
+        body = reference_cache.get_compressed(payload, encoding)
+        # Every encoding is a different representation, with its own strong ETag.
+        etag += "-" + encoding
+
+    response = Response(body, mimetype="application/json")
+    if encoding is not None:
+        response.content_encoding = encoding
+    if len(payload.body) >= compression.MIN_SIZE:
+        response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compresses the body of a JSON response if it is large enough and the client accepts a compressed response.
+    """
+    if response.direct_passthrough or response.content_encoding is not None or response.status_code == 304:
+        return response
+
+    body = response.get_data()
+    if len(body) < compression.MIN_SIZE:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = compression.choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compression.compress(body, encoding))
+    response.content_encoding = encoding
+    return response
+
+
+def page_arguments(data: dict) -> dict:
+    """
+    Reads the optional keyset pagination arguments `before`, `since` and `limit` from request data.
+
+    :raises: BadRequest if a cursor or the limit is malformed.
+    """
+    arguments = {}
+    try:
+        for key in ["before", "since"]:
+            if data.get(key) is not None:
+                arguments[key] = repository.decode_cursor(data[key])
+        if data.get("limit") is not None:
+            arguments["limit"] = int(data["limit"])
+    except (ValueError, TypeError, AttributeError):
+        raise BadRequest("Invalid pagination cursor or limit.")
+    return arguments
+
+
+def page_cursors(rows: list, limit: int, since: str = None) -> dict:
+    """
+    Creates the cursors for the next requests of a paginated feed.
+    The `since` cursor is used to poll for newer entries, the `before` cursor to fetch older entries.
+    `before` is None when there are no older entries, or when the page was polled with `since`.
+
+    :param rows: The page of rows, in chronological order.
+    :param limit: The page size which was requested.
+    :param since: The `since` cursor the page was requested with, if any.
+    """
+    cursors = {"since": since, "before": None}
+    if len(rows) == 0:
+        return cursors
+
+    first, last = rows[0], rows[-1]
+    cursors["since"] = repository.encode_cursor(last.time, last.id)
+    if since is None and len(rows) >= min(limit, repository.MAX_PAGE_SIZE):
+        cursors["before"] = repository.encode_cursor(first.time, first.id)
+    return cursors
+
+
 def require_login():
     """
     Add this decorator to an end point to require that a user is logged in.
@@ -58,4 +165,4 @@ import endpoints.logs  # noqa
 import endpoints.socket  # noqa
 import endpoints.race   # noqa
 import endpoints.dnd_class  # noqa
-
+import endpoints.status  # noqa
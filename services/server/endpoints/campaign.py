@@ -16,7 +16,7 @@ def check_player(player: PlayerModel):
 
     if player is None:
         raise NotFound("This player does not exist.")
-    if player.owner is not user and not campaign_service.is_user_dm(user, player):
+    if player.owner_id != user.id and not campaign_service.is_user_dm(user, player):
         raise Unauthorized("This player is not yours.")
 
 
@@ -111,24 +111,14 @@ def get_players(campaign_id):
     user = session_user()
     campaign = campaign_service.get_campaign(campaign_id)
 
-    if not campaign_service.user_in_campaign(user, campaign) and campaign.user != user:
-        raise Unauthorized("You do not have any players in this campaign.")
-
     if campaign is None:
         raise NotFound("This campaign does not exist.")
 
-    players = player_service.get_players(campaign)
-    data = []
-    for player in players:
-        # Make sure you can only see your own backstory, or if you are the dm.
-        if player.owner_id != user.id and campaign.user_id != user.id:
-            player.backstory = ""
-
-        player_classes = player_service.get_classes(player)
-
-        data.append(player.to_json(default_response={"class": player_classes[0].name if len(player_classes) > 0 else "Classless"}))
+    if not campaign_service.user_in_campaign(user, campaign) and campaign.user_id != user.id:
+        raise Unauthorized("You do not have any players in this campaign.")
 
-    return data
+    players, classes = player_service.get_roster(campaign)
+    return player_service.roster_to_json(user, campaign, players, classes)
 
 
 @api.route('/campaigns/<int:campaign_id>/players/<int:player_id>', methods=["DELETE"])
@@ -4,8 +4,9 @@ from json import JSONDecodeError
 
 from flask import request
 
-from endpoints import api, json_api, require_login
+from endpoints import api, json_api, require_login, cached_json_response
 from lib.service import background_service, class_service
+from lib.utils import reference_cache
 from lib.user_session import session_user
 import zipfile
 
@@ -14,8 +15,9 @@ import zipfile
 @json_api()
 @require_login()
 def get_classes():
-    classes = class_service.get_classes()
-    return [cls.to_json() for cls in classes]
+    payload = reference_cache.get(reference_cache.CLASSES,
+                                  lambda: [cls.to_json() for cls in class_service.get_classes()])
+    return cached_json_response(payload)
 
 
 @api.route('/classes', methods=["POST"])
@@ -67,5 +69,6 @@ def get_class_by_id(class_id):
 @json_api()
 @require_login()
 def get_backgrounds():
-    backgrounds = background_service.get_backgrounds()
-    return [background.to_json() for background in backgrounds]
+    payload = reference_cache.get(reference_cache.BACKGROUNDS,
+                                  lambda: [background.to_json() for background in background_service.get_backgrounds()])
+    return cached_json_response(payload)
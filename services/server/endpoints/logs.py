@@ -1,9 +1,10 @@
 from flask import request
 from werkzeug.exceptions import BadRequest
 
+from lib.repository import repository
 from lib.service import log_service
 from lib.user_session import session_user, session_user_set
-from endpoints import api, json_api, require_login
+from endpoints import api, json_api, require_login, page_arguments, page_cursors
 
 
 
@@ -42,8 +43,9 @@ def get_logs():
         raise BadRequest()
 
     user = session_user()
+    arguments = page_arguments(data)
 
-    (error, logs) = log_service.get_logs(data["campaign_code"], user)
+    (error, logs) = log_service.get_logs(data["campaign_code"], user, **arguments)
     success = error == ""
 
     if not success:
@@ -66,7 +68,8 @@ def get_logs():
     return {
         "success": success,
         "error": error,
-        "logs": log_list
+        "logs": log_list,
+        "cursors": page_cursors(logs, arguments.get("limit", repository.DEFAULT_PAGE_SIZE), data.get("since"))
     }
 
 
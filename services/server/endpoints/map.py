@@ -1,11 +1,15 @@
 import os
 
-from flask import request
+from flask import request, send_file, send_from_directory
 from werkzeug.exceptions import BadRequest
 
 from lib.user_session import session_user, session_user_set
 from endpoints import api, json_api, require_login
 from lib.service import map_service
+from lib.utils import image_utils
+
+# Map image files get a new name on every upload and blobs are named by their content, so they never change.
+TILE_MAX_AGE = 365 * 24 * 60 * 60
 
 
 @api.route('/updatemapdata', methods=["POST"])
@@ -55,16 +59,16 @@ def get_all_maps():
     if not data or (False in [x in data for x in required_fields]):
         raise BadRequest()
 
-    maps = map_service.get_all_maps(data["campaign_id"])
+    maps = map_service.get_map_summaries(data["campaign_id"])
 
     maps_list = []
-    for map in maps:
-        if map.parent_map is None:
+    for map_id, map_name, parent_map_id in maps:
+        if parent_map_id is None:
             continue
 
         maps_list.append({
-            "map_id": map.id,
-            "map_name": map.name
+            "map_id": map_id,
+            "map_name": map_name
         })
 
     return {
@@ -105,13 +109,13 @@ def get_all_battlemaps():
     if not data or (False in [x in data for x in required_fields]):
         raise BadRequest()
 
-    maps = map_service.get_all_battlemaps(data["campaign_id"])
+    maps = map_service.get_battlemap_summaries(data["campaign_id"])
 
     maps_list = []
-    for map in maps:
+    for name, map_data in maps:
         maps_list.append({
-            "name": map.name,
-            "data": map.data
+            "name": name,
+            "data": map_data
         })
 
     return {
@@ -125,7 +129,7 @@ def get_all_battlemaps():
 @require_login()
 def get_maps(campaign_id):
     user = session_user()
-    map_model = map_service.get_root_map(user, campaign_id)
+    map_model = map_service.get_map_tree(user, campaign_id)
     if map_model is None:
         return map_service.create_map(user, campaign_id, 0, 0, None).to_json()
     return map_model.to_json(recursive=True)
@@ -179,6 +183,35 @@ def alter_map_image(map_id):
     return map_model.to_json()
 
 
+@api.route("/maps/<int:map_id>/tiles", methods=["GET"])
+@require_login()
+def get_map_tiles_info(map_id):
+    """
+    Returns the description of the tile pyramid of the map image; its size, tile size, levels and image sizes.
+    """
+    directory = map_service.get_map_pyramid_directory(map_id)
+    return send_from_directory(directory, "info.json", max_age=TILE_MAX_AGE)
+
+
+@api.route("/maps/<int:map_id>/tiles/<int:level>/<int:column>_<int:row>.webp", methods=["GET"])
+@require_login()
+def get_map_tile(map_id, level, column, row):
+    directory = map_service.get_map_pyramid_directory(map_id)
+    return send_from_directory(directory, "%d/%d_%d.webp" % (level, column, row), max_age=TILE_MAX_AGE)
+
+
+@api.route("/maps/<int:map_id>/thumbnail", methods=["GET"], defaults={"size": None})
+@api.route("/maps/<int:map_id>/thumbnail/<int:size>", methods=["GET"])
+@require_login()
+def get_map_thumbnail(map_id, size):
+    """
+    Returns a downscaled version of the map image, the smallest thumbnail if no size is given.
+    """
+    directory = map_service.get_map_pyramid_directory(map_id)
+    filename = "thumbnail.webp" if size is None else "%d.webp" % size
+    return send_from_directory(directory, filename, max_age=TILE_MAX_AGE)
+
+
 @api.route("/maps/<int:map_id>", methods=["DELETE"], defaults={"campaign_id": ""})
 @api.route("/campaigns/<int:campaign_id>/maps/<int:map_id>", methods=["DELETE"])
 @json_api()
@@ -188,7 +221,7 @@ def delete_map(campaign_id, map_id):
     deleted_map = map_service.delete_map(user, map_id)
 
     # Return the updated root map
-    return map_service.get_root_map(user, deleted_map.owner_id).to_json(recursive=True)
+    return map_service.get_map_tree(user, deleted_map.campaign_id).to_json(recursive=True)
 
 
 @api.route("/<int:campaign_id>/maps", methods=["POST"])
@@ -216,6 +249,53 @@ def create_editor_map(campaign_id):
     }
 
 
+@api.route("/<int:campaign_id>/maps", methods=["GET"])
+@json_api()
+@require_login()
+def get_editor_maps(campaign_id):
+    user = session_user()
+
+    success, error, editor_maps = map_service.get_editor_maps(user, campaign_id)
+    if not success:
+        return {
+            "success": success,
+            "error": error
+        }
+
+    maps_list = []
+    for editor_map in editor_maps:
+        map_json = editor_map.to_json()
+        map_json["image_url"] = "/api/%d/maps/%d/image" % (campaign_id, editor_map.id)
+        maps_list.append(map_json)
+
+    return {
+        "success": success,
+        "error": error,
+        "maps": maps_list
+    }
+
+
+@api.route("/<int:campaign_id>/maps/<int:map_id>/image", methods=["GET"])
+@require_login()
+def get_editor_map_image(campaign_id, map_id):
+    """
+    Streams the drawn image of an editor map from the blob store.
+    Blobs are immutable, so they are cached by their content hash.
+    """
+    user = session_user()
+    editor_map = map_service.get_editor_map_image(user, campaign_id, map_id)
+
+    # Maps stored before the type was taken from the image may carry any mime type of the client.
+    mime_type = editor_map.mime_type
+    if mime_type not in image_utils.ALLOWED_MIME_TYPES:
+        mime_type = "application/octet-stream"
+
+    response = send_file(map_service.get_editor_map_image_path(editor_map), mimetype=mime_type,
+                         etag=editor_map.blob_hash, max_age=TILE_MAX_AGE, conditional=True)
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
 @api.route("/maps/<int:map_id>", methods=["POST"])
 @json_api()
 @require_login()
@@ -1,9 +1,10 @@
 from flask import request
 from werkzeug.exceptions import BadRequest
 
+from lib.repository import repository
 from lib.service import message_service
 from lib.user_session import session_user, session_user_set
-from endpoints import api, json_api, require_login
+from endpoints import api, json_api, require_login, page_arguments, page_cursors
 
 
 @api.route('/createmessage', methods=["POST"])
@@ -40,8 +41,9 @@ def get_messages():
         raise BadRequest()
 
     user = session_user()
+    arguments = page_arguments(data)
 
-    (error, messages) = message_service.get_messages(data["campaign_id"], user)
+    (error, messages) = message_service.get_messages(data["campaign_id"], user, **arguments)
     success = error == ""
 
     if not success:
@@ -52,18 +54,17 @@ def get_messages():
 
     message_list = []
     for message in messages:
-        if message.sender is None:
-            continue
-
+        # The dungeon master sends messages without a player.
         message_list.append({
             "time": message.time,
             "message": message.message,
-            "sender_name": message.sender.owner.name,
-            "player_name": message.sender.name
+            "sender_name": message_service.sender_name(message),
+            "player_name": message.sender.name if message.sender is not None else None
         })
 
     return {
         "success": success,
         "error": error,
-        "messages": message_list
+        "messages": message_list,
+        "cursors": page_cursors(messages, arguments.get("limit", repository.DEFAULT_PAGE_SIZE), data.get("since"))
     }
@@ -1,13 +1,15 @@
-from endpoints import api, json_api, require_login
+from endpoints import api, json_api, require_login, cached_json_response
 from lib.repository import race_repository
+from lib.utils import reference_cache
 
 
 @api.route('/races', methods=["GET"])
 @json_api()
 @require_login()
 def get_races():
-    races = race_repository.get_races()
-    return [race.to_json() for race in races]
+    payload = reference_cache.get(reference_cache.RACES,
+                                  lambda: [race.to_json() for race in race_repository.get_races()])
+    return cached_json_response(payload)
 
 
 @api.route('/races/<string:race_name>', methods=["GET"])
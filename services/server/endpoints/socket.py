@@ -1,20 +1,85 @@
 import json
 
+from flask import request
+
 from services.server import socketio
 from flask_socketio import emit
 from flask_socketio import join_room, leave_room
 
+from lib.service import message_service
+from lib import user_session
 from lib.user_session import session_user, session_user_set
+from lib.utils import metrics, room_state
 from endpoints import api, json_api, require_login
 
+# Changes to the room state are broadcast as frames at this interval, 20 times per second.
+FRAME_INTERVAL = 1 / 20
+
+_frame_task = None
+
+# The resolved campaign of every chat room a connection joined, by connection and room.
+_chat_rooms = {}
+# The rooms every connection is a member of in the room state, by connection.
+_joined_rooms = {}
+
+
+def _send_frames():
+    while True:
+        socketio.sleep(FRAME_INTERVAL)
+        for room, frame in room_state.take_frames():
+            socketio.emit("update", frame, room=room)
+
+
+def _start_frame_task():
+    global _frame_task
+    if _frame_task is None:
+        _frame_task = socketio.start_background_task(_send_frames)
+
+
+def _chat_room(user, room):
+    rooms = _chat_rooms.setdefault(request.sid, {})
+    if room not in rooms:
+        rooms[room] = message_service.resolve_chat_room(user, room)
+    return rooms[room]
+
+
+def _leave_room_state(sid, room):
+    joined = _joined_rooms.get(sid)
+    if joined is None or room not in joined:
+        return
+
+    joined.discard(room)
+    if len(joined) == 0:
+        del _joined_rooms[sid]
+    room_state.leave(room)
+
 
 @socketio.on('join')
+@metrics.socket_event('join')
 @require_login()
 def on_join(data):
     user = session_user()
 
     room = data['campaign']
+
+    joined = _joined_rooms.setdefault(request.sid, set())
+    if room not in joined:
+        joined.add(room)
+        room_state.join(room)
+
+    # Flush the changes before joining, the snapshot of the state already contains them.
+    frame, snapshot = room_state.take_frame(room)
+    if frame is not None:
+        socketio.emit("update", frame, room=room)
+
     join_room(room)
+    emit("snapshot", snapshot)
+
+    chat_room = _chat_room(user, room)
+    emit("history", {
+        "campaign": room,
+        "messages": message_service.get_chat_history(room, chat_room[0] if chat_room is not None else None)
+    })
 
     message = {
         "message": user.name + ' has joined the room.'
@@ -24,11 +89,14 @@ def on_join(data):
 
 
 @socketio.on('leave')
+@metrics.socket_event('leave')
 @require_login()
 def on_leave(data):
     user = session_user()
     room = data['campaign']
     leave_room(room)
+    _chat_rooms.get(request.sid, {}).pop(room, None)
+    _leave_room_state(request.sid, room)
 
     message = {
         "message": user.name + ' has left the room.'
@@ -38,24 +106,57 @@ def on_leave(data):
 
 
 @socketio.on('message')
+@metrics.socket_event('message')
 @require_login()
 def handle_message(message):
     user = session_user()
     room = message.get("campaign")
 
-    message = {
-        "message": user.name + ": " + message.get("message")
-    }
+    message = message_service.queue_chat_message(room, _chat_room(user, room), user, message.get("message"))
     emit("message", json.dumps(message), json=True, room=room)
 
 
+@socketio.on('connect')
+def on_connect(*args):
+    user_session.connect_socket()
+
+
+@socketio.on('disconnect')
+def on_disconnect(*args):
+    _chat_rooms.pop(request.sid, None)
+    for room in list(_joined_rooms.get(request.sid, ())):
+        _leave_room_state(request.sid, room)
+    user_session.disconnect_socket()
+
+
 @socketio.on('update')
+@metrics.socket_event('update')
 @require_login()
 def on_update(data):
+    """
+    Applies a change to the state of the room, {"campaign": room, "patch": [operations]}.
+    The changes are broadcast to the whole room, including the sender, as coalesced frames
+    {"campaign": room, "version": version, "patch": [operations]}. Clients which join receive a
+    "snapshot" event {"campaign": room, "version": version, "state": state} and ignore the frames
+    with a version up to that of the snapshot.
+
+    :return: An error acknowledgement if the change is invalid.
+    """
     room = data['campaign']
     user = session_user()
 
     if room == "Testing" and user.name != "duncan":
         return
 
-    emit("update", data, json=True, room=room, include_self=False)
+    patch = data.get("patch")
+    if patch is None:
+        # Clients which send their full state set the top level keys of the room state.
+        patch = [{"op": "add", "path": "/" + key.replace("~", "~0").replace("/", "~1"), "value": value}
+                 for key, value in data.items() if key != "campaign"]
+
+    try:
+        room_state.apply(room, patch)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    _start_frame_task()
@@ -0,0 +1,23 @@
+import lib.database
+from lib import user_session
+from endpoints import api, json_api, require_login
+
+
+@api.route('/status/database', methods=["GET"])
+@json_api()
+@require_login()
+def get_database_status():
+    """
+    Returns the connection pool status and connection checkout wait times of this worker.
+    """
+    return lib.database.pool_statistics()
+
+
+@api.route('/status/users', methods=["GET"])
+@json_api()
+@require_login()
+def get_user_cache_status():
+    """
+    Returns the size and the hit and miss counters of the user cache of this worker.
+    """
+    return user_session.user_cache_statistics()
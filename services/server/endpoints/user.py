@@ -1,8 +1,9 @@
 from flask import request, Response
 from werkzeug.exceptions import BadRequest
 
-from endpoints import api, json_api, require_login
+from endpoints import api, json_api, require_login, cached_json_response
 from lib.service import player_service, user_service, item_service
+from lib.utils import reference_cache
 from lib.user_session import session_user, session_user_set
 
 
@@ -192,8 +193,13 @@ def get_items():
 @require_login()
 def get_available_spells():
     user = session_user()
-    spells_list = player_service.get_spells(user)
-    return [spell.to_json() for spell in spells_list]
+    payload = reference_cache.get(reference_cache.SPELLS,
+                                  lambda: [spell.to_json() for spell in player_service.get_base_spells()])
+
+    # Custom spells of the user are appended to the cached base game spells.
+    user_spells = player_service.get_user_spells(user)
+    payload = reference_cache.extend(payload, [spell.to_json() for spell in user_spells])
+    return cached_json_response(payload)
 
 
 @api.route('/user/spells', methods=["POST"])
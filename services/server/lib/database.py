@@ -4,12 +4,16 @@ Shoutout to Floens.
 This file contains all the function used for setting up the database and database routines.
 """
 
+import threading
+import time
 from contextlib import contextmanager
 from typing import Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 
 OrmModelBase = declarative_base()
 
@@ -17,6 +21,30 @@ _scoped_session = None
 _session_cls = None
 _engine = None
 
+_pool_metrics_lock = threading.Lock()
+_pool_metrics = {
+    "checkouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+
+class _TimedQueuePool(QueuePool):
+    """
+    A QueuePool which records how long callers waited to check out a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with _pool_metrics_lock:
+                _pool_metrics["checkouts"] += 1
+                _pool_metrics["wait_seconds_total"] += waited
+                _pool_metrics["wait_seconds_max"] = max(_pool_metrics["wait_seconds_max"], waited)
+
 
 @contextmanager
 def session():
@@ -62,12 +90,16 @@ def register_teardown(flask_app):
         _scoped_session.remove()
 
 
-def init_db(connect_string):
+def init_db(connect_string, config=None):
     """
     Initialise the database with the given connection string.
     :param connect_string: the connection string passed to create_engine,
     in the form of sqlite:///dblocation.db, could be another database engine
     such as postgres.
+    :param config: the [database] section of the config file. The following optional keys are used:
+     - pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping: connection pool settings.
+     - sqlite_journal_mode, sqlite_synchronous, sqlite_busy_timeout, sqlite_mmap_size: pragmas applied
+       to every new SQLite connection.
     """
 
     global _scoped_session
@@ -75,13 +107,84 @@ def init_db(connect_string):
     global _engine
     global OrmModelBase
 
-    _engine = create_engine(connect_string, echo=False)
+    config = config if config is not None else {}
+    url = make_url(connect_string)
+    is_sqlite = url.get_backend_name() == "sqlite"
+
+    engine_args = {}
+    if not (is_sqlite and url.database in (None, "", ":memory:")):
+        # In memory SQLite databases keep their default single connection pool.
+        engine_args = dict(
+            poolclass=_TimedQueuePool,
+            pool_size=_config_int(config, "pool_size", 5),
+            max_overflow=_config_int(config, "max_overflow", 10),
+            pool_timeout=_config_int(config, "pool_timeout", 30),
+            pool_recycle=_config_int(config, "pool_recycle", 3600),
+            pool_pre_ping=_config_bool(config, "pool_pre_ping", True),
+        )
+        if is_sqlite:
+            engine_args["connect_args"] = {"check_same_thread": False}
+
+    _engine = create_engine(connect_string, echo=False, **engine_args)
+
+    if is_sqlite:
+        _register_sqlite_pragmas(_engine, config)
 
     _session_cls = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
 
     _scoped_session = scoped_session(_session_cls)
 
 
+def _config_int(config, key, default):
+    return int(config.get(key, default))
+
+
+def _config_bool(config, key, default):
+    value = config.get(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "yes", "true", "on")
+    return bool(value)
+
+
+def _register_sqlite_pragmas(engine, config):
+    """
+    Apply the SQLite pragmas to every new connection.
+    WAL mode lets readers continue while a write is in progress, which avoids most lock contention.
+    """
+    pragmas = [
+        "PRAGMA journal_mode=%s" % config.get("sqlite_journal_mode", "WAL"),
+        "PRAGMA synchronous=%s" % config.get("sqlite_synchronous", "NORMAL"),
+        "PRAGMA busy_timeout=%d" % _config_int(config, "sqlite_busy_timeout", 5000),
+        "PRAGMA mmap_size=%d" % _config_int(config, "sqlite_mmap_size", 268435456),
+    ]
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def pool_statistics() -> dict:
+    """
+    Returns the connection pool status and the time spent waiting on connection checkouts.
+    Use these numbers to size the pool against the amount of workers.
+    """
+    with _pool_metrics_lock:
+        statistics = dict(_pool_metrics)
+
+    pool = _engine.pool if _engine is not None else None
+    if isinstance(pool, QueuePool):
+        statistics.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    return statistics
+
+
 def metadata_create_all():
     """
     Create the tables for the database model.
@@ -2,7 +2,7 @@ import json
 from typing import Any
 
 from sqlalchemy import Integer, Column, String, ForeignKey, JSON, PickleType
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 
 from lib.database import OrmModelBase
 from lib.model.models import UserModel
@@ -24,7 +24,7 @@ class ClassModel(OrmModelBase):
     owner = relationship("UserModel")
 
     name = Column(String())
-    data = Column(JSON())
+    data = deferred(Column(JSON()))
 
     def __init__(self, owner: UserModel = None, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
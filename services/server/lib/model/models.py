@@ -1,35 +1,61 @@
 from __future__ import annotations
 
-import copy
 import datetime
 import os
 from typing import Any
 
 import qrcode
-from sqlalchemy import Column, Integer, String, ForeignKey, LargeBinary, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, LargeBinary, DateTime, Boolean, JSON, Index, inspect
 from sqlalchemy.orm import relationship, deferred
 
-from lib.database import OrmModelBase, request_session
+from lib.database import OrmModelBase
+
+
+# The value types which are part of the JSON representation, other values such as dates are left out.
+JSON_TYPES = frozenset((str, int, bool, float, dict))
 
 
 class JSONAble:
+    # Deferred columns which are part of the JSON representation, they are loaded if they are not loaded yet.
+    # List queries should undefer these columns to prevent a query per row.
+    json_deferred = ()
+    # Attributes which are not columns but are part of the JSON representation, and columns which are not.
+    json_include = ()
+    json_exclude = ()
+
     def to_json(self, default_response=None):
         if default_response is None:
             response = {}
         else:
-            response = copy.deepcopy(default_response)
+            response = dict(default_response)
 
-        def _is_valid(k, v):
-            allowed_types = [str, int, bool, float, datetime, dict]
-            return (
-                    not k.startswith("_") and
-                    type(v) in allowed_types
-            )
+        for key in self.json_deferred:
+            getattr(self, key)
 
-        response.update({k: v for k, v in self.__dict__.items() if _is_valid(k, v)})
+        # Unloaded attributes, relationships and values of other types are left out.
+        values = self.__dict__
+        for key in _json_keys(type(self)):
+            value = values.get(key)
+            if type(value) in JSON_TYPES:
+                response[key] = value
         return response
 
 
+_json_keys_by_class = {}
+
+
+def _json_keys(cls) -> tuple:
+    """
+    The keys of the JSON representation of a model class, taken once from the columns of its mapper.
+    """
+    keys = _json_keys_by_class.get(cls)
+    if keys is None:
+        columns = [attribute.key for attribute in inspect(cls).column_attrs if not attribute.key.startswith("_")]
+        keys = tuple(key for key in columns + list(cls.json_include) if key not in cls.json_exclude)
+        _json_keys_by_class[cls] = keys
+    return keys
+
+
 class UserModel(OrmModelBase, JSONAble):
     """
     A user login model.
@@ -43,6 +69,8 @@ class UserModel(OrmModelBase, JSONAble):
     password = deferred(Column(LargeBinary(), nullable=False))
     email = Column(String(), unique=True, nullable=True)
 
+    json_exclude = ("password",)
+
 
 class EmailResetModel(OrmModelBase, JSONAble):
     """
@@ -60,6 +88,30 @@ class EmailResetModel(OrmModelBase, JSONAble):
     date = Column(DateTime(), default=datetime.datetime.now())
 
 
+class EmailOutboxModel(OrmModelBase, JSONAble):
+    """
+    An email which is waiting to be sent, or was sent, by the background email sender.
+    """
+
+    __tablename__ = 'email_outbox'
+
+    id = Column(Integer(), primary_key=True)
+
+    recipient = Column(String(), nullable=False)
+    subject = Column(String(), nullable=False)
+    content = deferred(Column(String(), nullable=False))
+
+    created = Column(DateTime(), default=datetime.datetime.now)
+    attempts = Column(Integer(), default=0, nullable=False)
+    next_attempt = Column(DateTime(), default=datetime.datetime.now, nullable=False)
+    sent = Column(DateTime(), nullable=True)
+    last_error = Column(String(), nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_pending", "sent", "next_attempt"),
+    )
+
+
 class EnemyModel(OrmModelBase, JSONAble):
     """
     An enemy for a campaign, which may be used in a game.
@@ -112,7 +164,7 @@ class CampaignModel(OrmModelBase, JSONAble):
 
     id = Column(Integer(), primary_key=True)
 
-    user_id = Column(Integer(), ForeignKey("user.id"))
+    user_id = Column(Integer(), ForeignKey("user.id"), index=True)
     user = relationship("UserModel")
 
     name = Column(String(), nullable=False, default="New Campaign")
@@ -154,33 +206,30 @@ class MapModel(OrmModelBase, JSONAble):
     campaign = relationship("CampaignModel")
 
     parent_map_id = Column(Integer(), ForeignKey("map.id"), nullable=True)
-    parent_map = relationship("MapModel")
+    parent_map = relationship("MapModel", remote_side=[id], back_populates="children")
+    children = relationship("MapModel", back_populates="parent_map", order_by="MapModel.id")
 
     filename = Column(String(), nullable=False, default="default.png")
     x = Column(Integer(), nullable=False, default=0)
     y = Column(Integer(), nullable=False, default=0)
 
     name = Column(String(), nullable=True, default="New Map")
-    story = Column(String(), nullable=True, default="")
+    story = deferred(Column(String(), nullable=True, default=""))
 
     visible = Column(Boolean(), nullable=False, default=True)
 
+    json_deferred = ("story",)
+
     def to_json(self, recursive=False):
         response = super().to_json()
 
         children = []
         if recursive:
-            children = [m.to_json(recursive=True) for m in self.children()]
+            children = [m.to_json(recursive=True) for m in self.children]
         response["children"] = children
 
         return response
 
-    def children(self):
-        # TODO: Define this with one-to-many database definition in sqlaclhemy
-        # https://docs.sqlalchemy.org/en/20/orm/basic_relationships.html
-        db = request_session()
-        return db.query(MapModel).filter(MapModel.parent_map_id == self.id).all()
-
 
 class CreatorMapModel(OrmModelBase, JSONAble):
     """
@@ -195,11 +244,19 @@ class CreatorMapModel(OrmModelBase, JSONAble):
     campaign_id = Column(Integer(), ForeignKey("campaign.id"), nullable=False)
     campaign = relationship("CampaignModel")
 
-    map_base64 = Column(String(), nullable=False)
+    # Legacy storage of the drawn image, the image is now stored in the blob store and this is empty.
+    map_base64 = deferred(Column(String(), nullable=False, default=""))
     name = Column(String(), nullable=False)
     grid_size = Column(Integer(), nullable=True, default=1)
     grid_type = Column(String(), nullable=True, default="none")
 
+    # The drawn image in the blob store, see `lib.utils.blob_store`.
+    blob_hash = Column(String(64), nullable=True)
+    blob_size = Column(Integer(), nullable=True)
+    mime_type = Column(String(), nullable=True)
+    width = Column(Integer(), nullable=True)
+    height = Column(Integer(), nullable=True)
+
     creator_id = Column(Integer(), ForeignKey("user.id"), nullable=False)
     creator = relationship("UserModel")
 
@@ -220,7 +277,11 @@ class MessageModel(OrmModelBase, JSONAble):
     sender = relationship("PlayerModel")
 
     message = Column(String(), nullable=False)
-    time = Column(DateTime(), default=datetime.datetime.now())
+    time = Column(DateTime(), default=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_message_campaign_time", "campaign_id", "time", "id"),
+    )
 
 
 class LogModel(OrmModelBase, JSONAble):
@@ -241,7 +302,11 @@ class LogModel(OrmModelBase, JSONAble):
     title = Column(String(), nullable=False)
     text = Column(String(), nullable=False)
 
-    time = Column(DateTime(), default=datetime.datetime.now())
+    time = Column(DateTime(), default=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_log_campaign_time", "campaign_id", "time", "id"),
+    )
 
 
 class BattlemapModel(OrmModelBase, JSONAble):
@@ -260,7 +325,9 @@ class BattlemapModel(OrmModelBase, JSONAble):
     creator = relationship("PlayerModel")
 
     name = Column(String(), nullable=False)
-    data = Column(String(), nullable=False)
+    data = deferred(Column(String(), nullable=False))
+
+    json_deferred = ("data",)
 
 
 class PlayerModel(OrmModelBase, JSONAble):
@@ -278,6 +345,10 @@ class PlayerModel(OrmModelBase, JSONAble):
     owner_id = Column(Integer(), ForeignKey("user.id"))
     owner = relationship("UserModel")
 
+    __table_args__ = (
+        Index("ix_player_owner_campaign", "owner_id", "campaign_id"),
+    )
+
     name = Column(String(), nullable=False)
     race = Column(String(), nullable=False, default="Human")
 
@@ -422,7 +493,7 @@ class SpellModel(OrmModelBase, JSONAble):
     name = Column(String(), nullable=True)
     phb_page = Column(Integer(), nullable=True)
 
-    description = Column(String(), nullable=False)
+    description = deferred(Column(String(), nullable=False))
     higher_level = Column(String(), nullable=True)
     level = Column(Integer(), nullable=True)
 
@@ -439,6 +510,8 @@ class SpellModel(OrmModelBase, JSONAble):
 
     school = Column(String(), nullable=False)
 
+    json_deferred = ("description",)
+
 
 class PlayerSpellModel(OrmModelBase, JSONAble):
     """
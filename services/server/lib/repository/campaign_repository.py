@@ -1,5 +1,7 @@
 from typing import List, Optional
 
+from sqlalchemy import exists
+
 from lib.database import request_session
 from lib.model.models import CampaignModel, UserModel, PlayerModel
 
@@ -16,7 +18,7 @@ def get_campaigns(user: UserModel) -> List[CampaignModel]:
     db = request_session()
 
     return db.query(CampaignModel) \
-        .filter(CampaignModel.user == user) \
+        .filter(CampaignModel.user_id == user.id) \
         .all()
 
 
@@ -45,3 +47,19 @@ def get_campaign(pid: int = None, code: str = None) -> Optional[CampaignModel]:
         )
 
 
+def user_has_player_in_campaign(user_id: int, campaign_id: int) -> bool:
+    db = request_session()
+
+    return db.query(exists()
+                    .where(PlayerModel.owner_id == user_id)
+                    .where(PlayerModel.campaign_id == campaign_id)) \
+        .scalar()
+
+
+def user_owns_campaign(user_id: int, campaign_id: int) -> bool:
+    db = request_session()
+
+    return db.query(exists()
+                    .where(CampaignModel.id == campaign_id)
+                    .where(CampaignModel.user_id == user_id)) \
+        .scalar()
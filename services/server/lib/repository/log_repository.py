@@ -1,15 +1,24 @@
 from typing import List, Optional
 
+from sqlalchemy.orm import joinedload
+
 from lib.database import request_session
-from lib.model.models import LogModel
+from lib.model.models import LogModel, PlayerModel
+from lib.repository import repository
 
 
-def get_logs(campaign_id: int) -> List[LogModel]:
+def get_logs(campaign_id: int, before=None, since=None, limit: int = repository.DEFAULT_PAGE_SIZE) -> List[LogModel]:
+    """
+    Gets a page of logs of a campaign, with their creators and the creators' owners loaded.
+    See `repository.paginate_keyset` for the meaning of the cursors.
+    """
     db = request_session()
 
-    return db.query(LogModel) \
-        .filter(LogModel.campaign_id == campaign_id) \
-        .all()
+    query = db.query(LogModel) \
+        .options(joinedload(LogModel.creator).joinedload(PlayerModel.owner)) \
+        .filter(LogModel.campaign_id == campaign_id)
+
+    return repository.paginate_keyset(query, LogModel.time, LogModel.id, before, since, limit)
 
 
 def create_log(log_model: LogModel):
@@ -1,4 +1,7 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
+
+from sqlalchemy.orm import undefer
+from sqlalchemy.orm.attributes import set_committed_value
 
 from lib.database import request_session
 from lib.model.models import MapModel, BattlemapModel, CreatorMapModel
@@ -20,10 +23,49 @@ def commit():
 def get_children(map_id: int) -> Optional[List[MapModel]]:
     db = request_session()
 
-    return db.query(MapModel) \
-        .filter(MapModel.parent_map_id == map_id) \
+    map_model = db.query(MapModel).get(map_id)
+    if map_model is None:
+        return None
+
+    get_map_tree(map_model.campaign_id)
+    return map_model.children
+
+
+def get_map_tree(campaign_id: int) -> Optional[MapModel]:
+    """
+    Loads the whole map hierarchy of a campaign with a single query and links the
+    `children` and `parent_map` relationships in memory, so walking the tree does not
+    issue a query per node.
+
+    :param campaign_id: The campaign for which to load the maps.
+    :return: The root map of the campaign, or None if the campaign has no maps.
+    """
+    db = request_session()
+
+    maps = db.query(MapModel) \
+        .options(undefer(MapModel.story)) \
+        .filter(MapModel.campaign_id == campaign_id) \
+        .order_by(MapModel.id) \
         .all()
 
+    children = {map_model.id: [] for map_model in maps}
+    nodes = {map_model.id: map_model for map_model in maps}
+    root = None
+    for map_model in maps:
+        parent = nodes.get(map_model.parent_map_id)
+        if parent is not None:
+            children[parent.id].append(map_model)
+            set_committed_value(map_model, "parent_map", parent)
+        elif map_model.parent_map_id is None:
+            set_committed_value(map_model, "parent_map", None)
+            if root is None:
+                root = map_model
+
+    for map_model in maps:
+        set_committed_value(map_model, "children", children[map_model.id])
+
+    return root
+
 
 def get_all_maps(campaign_id: str) -> List[MapModel]:
     db = request_session()
@@ -33,6 +75,28 @@ def get_all_maps(campaign_id: str) -> List[MapModel]:
         .all()
 
 
+def get_map_summaries(campaign_id: int) -> List[Tuple[int, str, Optional[int]]]:
+    """
+    Returns (id, name, parent_map_id) of all maps of a campaign, without loading the full models.
+    """
+    db = request_session()
+
+    return db.query(MapModel.id, MapModel.name, MapModel.parent_map_id) \
+        .filter(MapModel.campaign_id == campaign_id) \
+        .all()
+
+
+def get_battlemap_summaries(campaign_id: int) -> List[Tuple[str, str]]:
+    """
+    Returns (name, data) of all battlemaps of a campaign, without loading the full models.
+    """
+    db = request_session()
+
+    return db.query(BattlemapModel.name, BattlemapModel.data) \
+        .filter(BattlemapModel.campaign_id == campaign_id) \
+        .all()
+
+
 def get_all_battlemaps(campaign_id: int):
     db = request_session()
 
@@ -46,4 +110,24 @@ def get_editor_map(map_id) -> Optional[CreatorMapModel]:
 
     return db.query(CreatorMapModel) \
         .filter(CreatorMapModel.id == map_id) \
-        .one_or_none()
\ No newline at end of file
+        .one_or_none()
+
+
+def get_editor_maps(campaign_id: int) -> List[CreatorMapModel]:
+    db = request_session()
+
+    return db.query(CreatorMapModel) \
+        .filter(CreatorMapModel.campaign_id == campaign_id) \
+        .all()
+
+
+def get_editor_maps_to_migrate() -> List[int]:
+    """
+    Returns the ids of the editor maps of which the image is not in the blob store yet.
+    """
+    db = request_session()
+
+    return [map_id for (map_id,) in db.query(CreatorMapModel.id)
+            .filter(CreatorMapModel.blob_hash.is_(None))
+            .order_by(CreatorMapModel.id)
+            .all()]
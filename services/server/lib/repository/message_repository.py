@@ -1,12 +1,23 @@
 from typing import List
 
+from sqlalchemy.orm import joinedload
+
 from lib.database import request_session
-from lib.model.models import MessageModel
+from lib.model.models import CampaignModel, MessageModel, PlayerModel
+from lib.repository import repository
 
 
-def get_messages(campaign_id: int) -> List[MessageModel]:
+def get_messages(campaign_id: int, before=None, since=None,
+                 limit: int = repository.DEFAULT_PAGE_SIZE) -> List[MessageModel]:
+    """
+    Gets a page of messages of a campaign, with their senders, the senders' owners and the dungeon master loaded.
+    See `repository.paginate_keyset` for the meaning of the cursors.
+    """
     db = request_session()
 
-    return db.query(MessageModel) \
-        .filter(MessageModel.campaign_id == campaign_id) \
-        .all()
+    query = db.query(MessageModel) \
+        .options(joinedload(MessageModel.sender).joinedload(PlayerModel.owner),
+                 joinedload(MessageModel.campaign).joinedload(CampaignModel.user)) \
+        .filter(MessageModel.campaign_id == campaign_id)
+
+    return repository.paginate_keyset(query, MessageModel.time, MessageModel.id, before, since, limit)
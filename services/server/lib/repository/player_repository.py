@@ -1,6 +1,7 @@
 from typing import Optional, List
 
 from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
 
 from lib.database import request_session
 from lib.model.class_models import ClassModel, SubclassModel
@@ -18,6 +19,47 @@ def get_players(campaign_id: int):
 
 
 
+def get_players_with_owners(campaign_id: Optional[int]) -> List[PlayerModel]:
+    """
+    Gets the players of a campaign with their owners loaded in the same query.
+    If campaign_id is None, all players which are in a campaign are returned.
+    """
+    db = request_session()
+
+    query = db.query(PlayerModel) \
+        .options(joinedload(PlayerModel.owner)) \
+        .join(CampaignModel)
+
+    if campaign_id is not None:
+        query = query.filter(CampaignModel.id == campaign_id)
+
+    return query.order_by(PlayerModel.id).all()
+
+
+def get_player_id_in_campaign(owner_id: int, campaign_id: int) -> Optional[int]:
+    """
+    Gets the id of the first player of a user in a campaign, without loading the player.
+    """
+    db = request_session()
+
+    row = db.query(PlayerModel.id) \
+        .filter(PlayerModel.owner_id == owner_id, PlayerModel.campaign_id == campaign_id) \
+        .order_by(PlayerModel.id) \
+        .first()
+    return row[0] if row is not None else None
+
+
+def get_classes_by_ids(class_ids: List[int]) -> List[ClassModel]:
+    if len(class_ids) == 0:
+        return []
+
+    db = request_session()
+
+    return db.query(ClassModel) \
+        .filter(ClassModel.id.in_(class_ids)) \
+        .all()
+
+
 def get_player_item(item: ItemModel, player: Optional[PlayerModel]) -> Optional[ItemModel]:
     db = request_session()
 
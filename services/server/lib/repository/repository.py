@@ -1,8 +1,65 @@
+import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_, and_
+
 from lib.database import request_session
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
 
 def add_and_commit(generic):
     db = request_session()
 
     db.add(generic)
     db.commit()
+
+
+def encode_cursor(time: datetime.datetime, row_id: int) -> str:
+    """
+    Encodes the (time, id) position of a row into an opaque cursor string.
+    """
+    return "%s_%d" % (time.isoformat(), row_id)
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """
+    Decodes a cursor created by `encode_cursor`.
+
+    :raises: ValueError if the cursor is malformed.
+    """
+    time, row_id = cursor.rsplit("_", 1)
+    return datetime.datetime.fromisoformat(time), int(row_id)
+
+
+def paginate_keyset(query, time_column, id_column, before: Optional[Tuple[datetime.datetime, int]] = None,
+                    since: Optional[Tuple[datetime.datetime, int]] = None, limit: int = DEFAULT_PAGE_SIZE) -> List:
+    """
+    Applies keyset pagination on (time, id) to a query.
+    Without `since`, the newest `limit` rows (older than `before`, if given) are returned.
+    With `since`, the oldest `limit` rows newer than the cursor are returned.
+    Rows are always returned in chronological order.
+
+    :param query: The query to paginate.
+    :param time_column: The time column to order by.
+    :param id_column: The id column used to break ties between equal times.
+    :param before: A decoded cursor, only rows before this position are returned.
+    :param since: A decoded cursor, only rows after this position are returned.
+    :param limit: The maximum amount of rows, capped at MAX_PAGE_SIZE.
+    :return: A list of rows.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if before is not None:
+        time, row_id = before
+        query = query.filter(or_(time_column < time, and_(time_column == time, id_column < row_id)))
+
+    if since is not None:
+        time, row_id = since
+        query = query.filter(or_(time_column > time, and_(time_column == time, id_column > row_id)))
+        return query.order_by(time_column, id_column).limit(limit).all()
+
+    rows = query.order_by(time_column.desc(), id_column.desc()).limit(limit).all()
+    rows.reverse()
+    return rows
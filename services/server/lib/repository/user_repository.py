@@ -1,15 +1,7 @@
-import smtplib
-from email.header import Header
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
 from typing import Optional
 
-import flask
-
-from services.server import app
-from lib.database import request_session
-from lib.model.models import UserModel, EmailResetModel
+from lib.database import request_session, session
+from lib.model.models import UserModel, EmailResetModel, EmailOutboxModel
 
 
 def add(user: UserModel):
@@ -19,6 +11,28 @@ def add(user: UserModel):
     db.commit()
 
 
+def release_user(user: UserModel):
+    """
+    Detaches the loaded user from the request session and returns its connection to the pool,
+    so no connection is held while the password is hashed. The request session reconnects when it is used again.
+    """
+    db = request_session()
+
+    db.expunge(user)
+    db.close()
+
+
+def update_password(user_id: int, password: bytes):
+    """
+    Stores a new password hash in a separate session, so the models of the request are not expired.
+    """
+    with session() as db:
+        db.query(UserModel) \
+            .filter(UserModel.id == user_id) \
+            .update({UserModel.password: password}, synchronize_session=False)
+        db.commit()
+
+
 def find_user_by_id(user_id: int):
     db = request_session()
 
@@ -42,30 +56,16 @@ def find_user_by_email(email: str) -> Optional[UserModel]:
 
 def send_email(user_model: UserModel, content: str, title: str):
     """
-    Generates an email with a link and sends it to the reset requester.
+    Queues an email to the user in the email outbox, it is sent by `email_service`.
 
     :param user_model: The user to send the email to.
     :param content: The body of the email to be send.
     :param title: The title of the email.
     """
-    email = user_model.email
-    msg = MIMEMultipart('alternative')
-    msg.attach(MIMEText(content, 'html'))
-
-    msg["From"] = formataddr((str(Header('DnDool', 'utf-8')), app.email_address))
-    msg["To"] = email
-    msg["Subject"] = title
-
-    host = flask.request.headers['Host']
-
-    try:
-        server = smtplib.SMTP_SSL(app.email_server, 465)
-        server.ehlo()
-        server.login(app.email_address, app.email_password)
-        server.sendmail(app.email_address, email, msg.as_string())
-        print("Successfully sent email")
-    except Exception:
-        print('Failed to send mail: ' + title)
+    db = request_session()
+
+    db.add(EmailOutboxModel(recipient=user_model.email, subject=title, content=content))
+    db.commit()
 
 
 def find_reset_with_code(code: str) -> Optional[EmailResetModel]:
@@ -3,6 +3,7 @@ from random import randint
 from sqlite3 import IntegrityError
 from typing import List, Optional
 
+from flask import g as flaskg
 from werkzeug.exceptions import Unauthorized, BadRequest
 
 from lib.database import request_session
@@ -80,6 +81,22 @@ def get_campaign(campaign_id: int = None, campaign_code: str = None) -> Optional
     return sub.one_or_none()
 
 
+def _memoized_check(name: str, user_id: int, campaign_id: int, check) -> bool:
+    """
+    Memoizes an authorization check for the lifetime of the current request,
+    keyed by (user_id, campaign_id).
+    """
+    memo = getattr(flaskg, name, None)
+    if memo is None:
+        memo = {}
+        setattr(flaskg, name, memo)
+
+    key = (user_id, campaign_id)
+    if key not in memo:
+        memo[key] = check(user_id, campaign_id)
+    return memo[key]
+
+
 def user_in_campaign(user: UserModel, campaign: CampaignModel):
     """
     Checks if the user has any players in the given campaign.
@@ -88,12 +105,8 @@ def user_in_campaign(user: UserModel, campaign: CampaignModel):
     :param campaign: The campaign model
     :return: A boolean. True if the user has 1 or more players in the given campaign, False if not.
     """
-    players = player_service.get_user_players(user)
-    for player in players:
-        if player.campaign == campaign:
-            return True
-
-    return False
+    return _memoized_check("campaign_membership", user.id, campaign.id,
+                           campaign_repository.user_has_player_in_campaign)
 
 
 def is_user_dm(user: UserModel, player: PlayerModel):
@@ -101,15 +114,11 @@ def is_user_dm(user: UserModel, player: PlayerModel):
         Checks if the user owns a campaign the player is in.
 
         :param user: The user which is logged in
-        :param campaign: The campaign model
-        :return: A boolean. True if the user has 1 or more players in the given campaign, False if not.
+        :param player: The player model
+        :return: A boolean. True if the user owns the campaign of the given player, False if not.
         """
-    campaigns = get_campaigns(user)
-    for campaign in campaigns:
-        if player.campaign == campaign:
-            return True
-
-    return False
+    return _memoized_check("campaign_dm", user.id, player.campaign_id,
+                           campaign_repository.user_owns_campaign)
 
 
 def update_campaign(user: UserModel, campaign_id: int, name: str = None) -> CampaignModel:
@@ -1,15 +1,17 @@
 from typing import List
 
 from sqlalchemy import or_, func
+from sqlalchemy.orm import joinedload, undefer
 
 from lib.database import request_session
 from lib.model.class_models import ClassModel, SubclassModel
 from lib.model.models import UserModel
+from lib.utils import reference_cache
 
 
 def get_classes() -> List[ClassModel]:
     db = request_session()
-    return db.query(ClassModel).all()
+    return db.query(ClassModel).options(joinedload(ClassModel.owner), undefer(ClassModel.data)).all()
 
 
 def get_class_by_name(class_name, owner_id=None) -> ClassModel:
@@ -66,10 +68,11 @@ def create_classes(user: UserModel, obj_dicts: List[dict]) -> List[ClassModel]:
             if model is not None:
                 model.data = obj_dict
             else:
-                model = ClassModel(owner=user, name=obj_dict.get("name"), data=obj_dict)
+                model = ClassModel(owner_id=user.id, name=obj_dict.get("name"), data=obj_dict)
                 db.add(model)
 
         models.append(model)
     db.commit()
+    reference_cache.invalidate(reference_cache.CLASSES)
 
     return sorted(list(set(models)), key=lambda x: x.name)
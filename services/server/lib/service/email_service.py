@@ -0,0 +1,125 @@
+"""
+Sends the emails of the email outbox in the background, so requests only have to enqueue an email.
+
+Failed emails are retried with an exponential backoff, up to MAX_ATTEMPTS times.
+The sender is started when the server is initialised, so the emails left over from earlier runs are sent as well.
+"""
+
+import datetime
+import threading
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+from sqlalchemy.orm import undefer
+
+from lib.database import session
+from lib.model.models import EmailOutboxModel
+from lib.utils import email_transport
+from services.server import app, socketio
+
+# Seconds between two checks of the outbox when the sender was not woken up.
+POLL_INTERVAL = 30
+# Maximum amount of emails sent in a single pass.
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 8
+# The delay before the first retry in seconds, it doubles after every attempt up to MAX_BACKOFF.
+BACKOFF = 30
+MAX_BACKOFF = 60 * 60
+
+_wake_event = threading.Event()
+_sender = None
+_transport = None
+
+
+def get_transport():
+    global _transport
+
+    if _transport is None:
+        _transport = email_transport.create_transport(app.email_transport, app.email_server,
+                                                      app.email_address, app.email_password)
+    return _transport
+
+
+def _create_message(email: EmailOutboxModel) -> MIMEMultipart:
+    message = MIMEMultipart('alternative')
+    message.attach(MIMEText(email.content, 'html'))
+
+    message["From"] = formataddr((str(Header('DnDool', 'utf-8')), app.email_address))
+    message["To"] = email.recipient
+    message["Subject"] = email.subject
+    return message
+
+
+def send_pending_emails() -> int:
+    """
+    Sends the emails in the outbox which are due, over a single connection.
+
+    :return: The amount of sent emails.
+    """
+    now = datetime.datetime.now()
+    transport = get_transport()
+    sent = 0
+
+    with session() as db:
+        emails = db.query(EmailOutboxModel) \
+            .options(undefer(EmailOutboxModel.content)) \
+            .filter(EmailOutboxModel.sent.is_(None),
+                    EmailOutboxModel.next_attempt <= now,
+                    EmailOutboxModel.attempts < MAX_ATTEMPTS) \
+            .order_by(EmailOutboxModel.next_attempt) \
+            .limit(BATCH_SIZE) \
+            .all()
+
+        try:
+            for email in emails:
+                email.attempts += 1
+                try:
+                    transport.send(email.recipient, _create_message(email))
+                    email.sent = datetime.datetime.now()
+                    email.last_error = None
+                    sent += 1
+                except Exception as e:
+                    delay = min(BACKOFF * 2 ** (email.attempts - 1), MAX_BACKOFF)
+                    email.next_attempt = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+                    email.last_error = str(e)
+                    print("Failed to send mail: %s (attempt %d)" % (email.subject, email.attempts))
+                db.commit()
+        finally:
+            # Keep the connection open while there are more emails, otherwise close it.
+            if len(emails) < BATCH_SIZE:
+                transport.close()
+
+    if len(emails) == BATCH_SIZE:
+        _wake_event.set()
+    return sent
+
+
+def _send_emails():
+    while True:
+        _wake_event.wait(POLL_INTERVAL)
+        _wake_event.clear()
+        try:
+            send_pending_emails()
+        except Exception as e:
+            print("Could not send emails: %s" % e)
+
+
+def start_sender():
+    """
+    Starts the background sender if it is not running, it then sends the emails left over from earlier runs.
+    """
+    global _sender
+
+    if _sender is None:
+        _sender = socketio.start_background_task(_send_emails)
+        _wake_event.set()
+
+
+def wake_sender():
+    """
+    Starts the background sender if it is not running, and lets it send the due emails.
+    """
+    start_sender()
+    _wake_event.set()
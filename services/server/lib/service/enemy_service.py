@@ -65,7 +65,7 @@ def add_ability(enemy_id: int, text: str, user: UserModel):
     if enemy is None:
         raise NotFound("This enemy does not exist.")
 
-    if enemy.user != user:
+    if enemy.user_id != user.id:
         raise Unauthorized("This enemy does not belong to this user.")
 
     ability = EnemyAbilityModel(enemy_id=enemy.id, owner_id=user.id, text=text)
@@ -99,7 +99,7 @@ def delete_ability(ability_id: int, user: UserModel):
 
 def edit_ability(ability_id, text, user):
     ability = enemy_repository.get_ability(ability_id)
-    if ability.enemy.user != user:
+    if ability.enemy.user_id != user.id:
         return "The ability you are trying to edit does not belong to an enemy created by you."
 
     ability.text = text
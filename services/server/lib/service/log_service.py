@@ -1,23 +1,27 @@
 from typing import List, Optional
 
 from lib.model.models import UserModel, LogModel
-from lib.repository import log_repository
+from lib.repository import log_repository, repository
 from lib.service import player_service, campaign_service
 
 
-def get_logs(campaign_code: str, user: UserModel) -> (str, List[LogModel]):
+def get_logs(campaign_code: str, user: UserModel, before=None, since=None,
+             limit: int = repository.DEFAULT_PAGE_SIZE) -> (str, List[LogModel]):
     """
-    Returns all logs for a specific campaign ID.
+    Returns a page of logs for a specific campaign ID, in chronological order.
 
     :param campaign_code:
     :param user:
+    :param before: Only return logs before this (time, id) cursor.
+    :param since: Only return logs after this (time, id) cursor.
+    :param limit: The maximum amount of logs to return.
     :return: A tuple (Error message, List with messages)
     """
     campaign = campaign_service.find_campaign_with_code(campaign_code)
     if campaign is None:
         return "This campaign does not exist.", []
 
-    return "", log_repository.get_logs(campaign.id)
+    return "", log_repository.get_logs(campaign.id, before, since, limit)
 
 
 def create_log(user: UserModel, campaign_code: str, title: str, text: str) -> str:
@@ -43,7 +47,7 @@ def delete_log(user: UserModel, campaign_code: str, log_id: int):
     if log is None:
         return "This log does not exist."
 
-    if log.creator.owner != user:
+    if log.creator.owner_id != user.id:
         return "This is not your log to delete."
 
     if log.campaign_id != campaign.id:
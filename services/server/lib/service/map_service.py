@@ -1,14 +1,16 @@
+import base64
+import binascii
 import os
 
 import string
 from random import randint
 from typing import Optional, List, Tuple
 
-from werkzeug.exceptions import BadRequest, Unauthorized
+from werkzeug.exceptions import BadRequest, Unauthorized, NotFound
 
-from lib.utils import image_utils
-from services.server import app
-from lib.database import request_session
+from lib.utils import image_utils, blob_store
+from services.server import app, socketio
+from lib.database import request_session, session
 from lib.model.models import MapModel, UserModel, BattlemapModel, CreatorMapModel
 from lib.repository import map_repository
 from lib.service import campaign_service
@@ -76,12 +78,14 @@ def alter_map(user: UserModel, map_id: int, map_img=None, name: str = None, stor
             filename = _create_random_string(15) + extension  # 15 seems like a large enough number for files.
 
             path = os.path.join(app.map_storage, filename)
-            if not os.path.isfile(path):
+            upload_path = path + ".upload"
+            if not os.path.isfile(path) and not os.path.isfile(upload_path):
                 break
 
-        map_img.save(path)
-        image_utils.resize_image(path)
-        map_model.filename = filename
+        # The filename of the map is switched once the image worker is done, see `_finish_map_image`.
+        map_img.save(upload_path)
+        future = image_utils.process_map_image_async(upload_path, path)
+        socketio.start_background_task(_finish_map_image, map_model.id, filename, upload_path, future)
     if x is not None:
         map_model.x = x
     if y is not None:
@@ -98,6 +102,57 @@ def alter_map(user: UserModel, map_id: int, map_img=None, name: str = None, stor
     return map_model
 
 
+def _finish_map_image(map_id: int, filename: str, upload_path: str, future):
+    """
+    Waits for the image worker to process an uploaded map image, then switches the map to the new image
+    and notifies the clients in the campaign room with a "map" event {"campaign": room, "map": map}.
+    This runs as a background task, outside of the request.
+    """
+    try:
+        future.result()
+    except Exception as e:
+        print("Failed to process map image %s: %s" % (filename, e))
+        return
+    finally:
+        if os.path.isfile(upload_path):
+            os.remove(upload_path)
+
+    with session() as db:
+        map_model = db.query(MapModel).filter(MapModel.id == map_id).one_or_none()
+        if map_model is None:
+            return
+
+        map_model.filename = filename
+        # Serialized before the commit, which expires the loaded attributes.
+        campaign_name = map_model.campaign.name
+        map_json = map_model.to_json()
+        db.commit()
+
+    # The "update" event carries the frames of the room state, the new image has an event of its own.
+    # Clients join the room of the campaign by its name.
+    socketio.emit("map", {
+        "campaign": campaign_name,
+        "map": map_json
+    }, room=campaign_name)
+
+
+def get_map_pyramid_directory(map_id: int) -> str:
+    """
+    Returns the directory containing the thumbnail, sizes and tiles of the image of a map.
+
+    :raises: NotFound if the map does not exist, or its image has no tile pyramid.
+    """
+    map_model = get_map(map_id)
+    if map_model is None:
+        raise NotFound("This map does not exist.")
+
+    directory = image_utils.pyramid_directory(os.path.join(app.map_storage, map_model.filename))
+    if not os.path.isdir(directory):
+        raise NotFound("This map image has no tiles.")
+
+    return os.path.abspath(directory)
+
+
 def get_map(map_id: int) -> Optional[MapModel]:
     db = request_session()
 
@@ -118,6 +173,10 @@ def get_all_maps(campaign_id: str) -> List[MapModel]:
     return map_repository.get_all_maps(campaign_id)
 
 
+def get_map_summaries(campaign_id: int):
+    return map_repository.get_map_summaries(campaign_id)
+
+
 def update_map(map_id: int, x=None, y=None, parent_id=None, name=None, story=None, image_id=None):
     map = get_map(map_id)
     if map is None:
@@ -156,10 +215,15 @@ def get_all_battlemaps(campaign_id: int):
     return map_repository.get_all_battlemaps(campaign_id)
 
 
+def get_battlemap_summaries(campaign_id: int):
+    return map_repository.get_battlemap_summaries(campaign_id)
+
+
 def create_editor_map(user: UserModel, campaign_id: int, map_base64: str, name: str, grid_size=1, grid_type="none") -> \
         Tuple[bool, str, int]:
     """
     Creates an editable map to be stored on the server.
+    The drawn image is stored in the blob store, only its hash and dimensions are stored in the database.
     Returns a tuple containing (Success, Error)
     If the request was successful, error is an empty string.
 
@@ -167,9 +231,10 @@ def create_editor_map(user: UserModel, campaign_id: int, map_base64: str, name:
     :param grid_size:
     :param user:
     :param campaign_id:
-    :param map_base64:
+    :param map_base64: The drawn image as a base64 data url.
     :param name:
     :return:
+    :raises: BadRequest if the image is not a PNG, JPEG or WebP image.
     """
     campaign = campaign_service.get_campaign(campaign_id)
     if campaign is None:
@@ -180,12 +245,16 @@ def create_editor_map(user: UserModel, campaign_id: int, map_base64: str, name:
 
     cmm = CreatorMapModel(
         campaign_id=campaign_id,
-        map_base64=map_base64,
         grid_size=grid_size,
         grid_type=grid_type,
         creator_id=user.id,
         name=name)
 
+    try:
+        store_editor_map_image(cmm, map_base64)
+    except ValueError as e:
+        raise BadRequest(str(e))
+
     # There cannot be a problem with duplicate maps, because they contain an unique id.
     db = request_session()
     db.add(cmm)
@@ -194,9 +263,43 @@ def create_editor_map(user: UserModel, campaign_id: int, map_base64: str, name:
     return True, "", cmm.id
 
 
+def _decode_data_url(map_base64: str) -> bytes:
+    """
+    Decodes an image data url, as created by canvas.toDataURL, or plain base64 into its content.
+    The mime type of the header is ignored, the type is taken from the image itself.
+    """
+    if map_base64.startswith("data:"):
+        map_base64 = map_base64.partition(",")[2]
+
+    try:
+        return base64.b64decode(map_base64, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("The map image is not valid base64.")
+
+
+def store_editor_map_image(editor_map: CreatorMapModel, map_base64: str):
+    """
+    Stores the drawn image of an editor map in the blob store, and links the map to it.
+    Identical images are only stored once.
+
+    :param editor_map:
+    :param map_base64: The drawn image as a base64 data url.
+    :raises: ValueError if the image cannot be decoded, or is not a PNG, JPEG or WebP image.
+    """
+    data = _decode_data_url(map_base64)
+    mime_type, width, height = image_utils.identify_image(data)
+
+    editor_map.blob_hash, editor_map.blob_size = blob_store.put(app.blob_storage, data)
+    editor_map.mime_type = mime_type
+    editor_map.width = width
+    editor_map.height = height
+    editor_map.map_base64 = ""
+
+
 def get_editor_maps(user: UserModel, campaign_id: int) -> Tuple[bool, str, Optional[List]]:
     """
     Gets all editor maps of the campaign if the user is in this campaign.
+    The drawn images are not loaded, see `get_editor_map_image`.
     :param user:
     :param campaign_id:
     :return:
@@ -208,8 +311,41 @@ def get_editor_maps(user: UserModel, campaign_id: int) -> Tuple[bool, str, Optio
     if not campaign_service.user_in_campaign(user, campaign):
         return False, "This user is not currently in this campaign.", None
 
-    db = request_session()
-    return True, "", db.query(CreatorMapModel).filter(CreatorMapModel.campaign_id == campaign_id).all()
+    return True, "", map_repository.get_editor_maps(campaign_id)
+
+
+def get_editor_map_image(user: UserModel, campaign_id: int, map_id: int) -> CreatorMapModel:
+    """
+    Gets an editor map of which the drawn image may be downloaded by the user.
+    Maps which are not migrated to the blob store yet, are migrated first.
+
+    :param user:
+    :param campaign_id:
+    :param map_id:
+    :return:
+    """
+    campaign = campaign_service.get_campaign(campaign_id)
+    if campaign is None:
+        raise NotFound("This campaign does not exist.")
+    if not campaign_service.user_in_campaign(user, campaign):
+        raise Unauthorized("This user is not currently in this campaign.")
+
+    editor_map = map_repository.get_editor_map(map_id)
+    if editor_map is None or editor_map.campaign_id != campaign.id:
+        raise NotFound("A map with map id `%d` does not exist." % map_id)
+
+    if editor_map.blob_hash is None or not blob_store.exists(app.blob_storage, editor_map.blob_hash):
+        try:
+            store_editor_map_image(editor_map, editor_map.map_base64)
+        except ValueError:
+            raise NotFound("This map has no image.")
+        map_repository.commit()
+
+    return editor_map
+
+
+def get_editor_map_image_path(editor_map: CreatorMapModel) -> str:
+    return os.path.abspath(blob_store.blob_path(app.blob_storage, editor_map.blob_hash))
 
 
 def delete_editor_map(user, campaign_id, map_id):
@@ -256,6 +392,17 @@ def get_root_map(user, campaign_id):
         .one_or_none()
 
 
+def get_map_tree(user, campaign_id):
+    """
+    Gets the root map for the campaign with all its (nested) children loaded.
+
+    :param user:
+    :param campaign_id:
+    :return:
+    """
+    return map_repository.get_map_tree(campaign_id)
+
+
 def delete_map(user, map_id):
     """
     Deletes a map given a map id.
@@ -270,7 +417,8 @@ def delete_map(user, map_id):
     if map_model is None:
         raise BadRequest("This map id does not exist.")
 
-    if len(map_model.children()) > 0:
+    map_repository.get_map_tree(map_model.campaign_id)
+    if len(map_model.children) > 0:
         raise BadRequest("You cannot delete a map with children. First delete sub-maps before deleting this map.")
 
     db = request_session()
@@ -1,17 +1,45 @@
-from typing import List
+import atexit
+import datetime
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
 
-from lib.database import request_session
+from lib.database import request_session, session
 from lib.model.models import UserModel, MessageModel
-from lib.repository import message_repository
+from lib.repository import message_repository, player_repository, repository
 from lib.service import campaign_service
+from services.server import socketio
 
+# Chat messages are written in a single transaction every FLUSH_INTERVAL seconds,
+# or as soon as FLUSH_SIZE messages are queued.
+FLUSH_INTERVAL = 0.5
+FLUSH_SIZE = 100
+# A message which could not be written this many times is dropped, so it does not hold back the messages after it.
+MAX_ATTEMPTS = 3
+# Amount of chat messages kept in memory per room, which are sent to clients joining the room.
+HISTORY_SIZE = 50
+# Amount of rooms of which the history is kept, the history of the least recently used room is removed first.
+# The history of a campaign is loaded from the database again when its room is used after it was removed.
+HISTORY_ROOMS = 256
 
-def get_messages(campaign_id: int, user: UserModel) -> (str, List[MessageModel]):
+_lock = threading.Lock()
+_flush_event = threading.Event()
+_writer = None
+# The queued messages with the amount of failed attempts to write them.
+_queue: List[Tuple[int, dict]] = []
+_history: "OrderedDict[str, Deque[dict]]" = OrderedDict()
+
+
+def get_messages(campaign_id: int, user: UserModel, before=None, since=None,
+                 limit: int = repository.DEFAULT_PAGE_SIZE) -> (str, List[MessageModel]):
     """
-    Returns all messages for a specific campaign ID.
+    Returns a page of messages for a specific campaign ID, in chronological order.
 
     :param campaign_id:
     :param user:
+    :param before: Only return messages before this (time, id) cursor.
+    :param since: Only return messages after this (time, id) cursor.
+    :param limit: The maximum amount of messages to return.
     :return: A tuple (Error message, List with messages)
     """
     campaign = campaign_service.get_campaign(campaign_id)
@@ -21,7 +49,7 @@ def get_messages(campaign_id: int, user: UserModel) -> (str, List[MessageModel])
     if campaign.user_id != user.id:
         return "This is not your campaign.", []
 
-    return "", message_repository.get_messages(campaign_id)
+    return "", message_repository.get_messages(campaign_id, before, since, limit)
 
 
 def create_message(campaign_code: str, user: UserModel, message: str):
@@ -34,3 +62,160 @@ def create_message(campaign_code: str, user: UserModel, message: str):
     db.add(message_model)
     db.commit()
     return message_model
+
+
+def resolve_chat_room(user: UserModel, room: str) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Resolves the campaign of a chat room, of which the name is the campaign id.
+
+    :return: A tuple (campaign id, player id of the user), or None if the room is not a campaign of the user.
+             The player id is None for the dungeon master.
+    """
+    try:
+        campaign = campaign_service.get_campaign(int(room))
+    except (TypeError, ValueError):
+        return None
+
+    if campaign is None:
+        return None
+    if campaign.user_id != user.id and not campaign_service.user_in_campaign(user, campaign):
+        return None
+
+    return campaign.id, player_repository.get_player_id_in_campaign(user.id, campaign.id)
+
+
+def sender_name(message: MessageModel) -> str:
+    """
+    Returns the name of the user who sent a message. Messages of the dungeon master have no sending player.
+    """
+    if message.sender is None:
+        return message.campaign.user.name
+    return message.sender.owner.name
+
+
+def _room_history(room: str, campaign_id: Optional[int]) -> Deque[dict]:
+    with _lock:
+        history = _history.get(room)
+        if history is not None:
+            _history.move_to_end(room)
+            return history
+
+    history = deque(maxlen=HISTORY_SIZE)
+    if campaign_id is not None:
+        # Only the first client of a room of which the history is not kept loads it from the database.
+        for message in message_repository.get_messages(campaign_id, limit=HISTORY_SIZE):
+            history.append({
+                "message": sender_name(message) + ": " + message.message,
+                "time": message.time.isoformat()
+            })
+
+    with _lock:
+        history = _history.setdefault(room, history)
+        _history.move_to_end(room)
+        while len(_history) > HISTORY_ROOMS:
+            _history.popitem(last=False)
+    return history
+
+
+def get_chat_history(room: str, campaign_id: Optional[int]) -> List[dict]:
+    """
+    Returns the most recent chat messages of a room, oldest first.
+    """
+    history = _room_history(room, campaign_id)
+    with _lock:
+        return list(history)
+
+
+def queue_chat_message(room: str, chat_room: Optional[Tuple[int, Optional[int]]], user: UserModel,
+                       message: str) -> dict:
+    """
+    Adds a chat message to the history of the room. If the room is a campaign, the message is queued
+    to be written to the database by the write-behind task.
+
+    :param room: The socket room.
+    :param chat_room: The resolved campaign of the room, see `resolve_chat_room`.
+    :param user: The sender.
+    :param message: The text of the message.
+    :return: The message as it is broadcast.
+    """
+    now = datetime.datetime.now()
+    entry = {"message": user.name + ": " + message, "time": now.isoformat()}
+
+    campaign_id = chat_room[0] if chat_room is not None else None
+    history = _room_history(room, campaign_id)
+
+    with _lock:
+        history.append(entry)
+        if chat_room is not None:
+            _queue.append((0, {"campaign_id": chat_room[0], "sender_id": chat_room[1], "message": message,
+                               "time": now}))
+            if len(_queue) >= FLUSH_SIZE:
+                _flush_event.set()
+
+    _start_writer()
+    return entry
+
+
+def _insert_messages(messages: List[dict]):
+    with session() as db:
+        db.bulk_insert_mappings(MessageModel, messages)
+        db.commit()
+
+
+def flush_chat_messages() -> int:
+    """
+    Writes all queued chat messages to the database in a single transaction.
+    If the transaction fails, the messages are written one by one, so only the messages which fail themselves
+    are queued again. A message which failed MAX_ATTEMPTS times is dropped.
+
+    :return: The amount of written messages.
+    """
+    with _lock:
+        if len(_queue) == 0:
+            return 0
+        batch = _queue[:]
+        del _queue[:]
+
+    try:
+        _insert_messages([message for _, message in batch])
+        return len(batch)
+    except Exception as e:
+        print("Could not write %d chat messages, writing them one by one: %s" % (len(batch), e))
+
+    written = 0
+    failed = []
+    for attempts, message in batch:
+        try:
+            _insert_messages([message])
+            written += 1
+        except Exception as e:
+            if attempts + 1 >= MAX_ATTEMPTS:
+                print("Dropped chat message of campaign %s after %d attempts: %s"
+                      % (message["campaign_id"], attempts + 1, e))
+            else:
+                failed.append((attempts + 1, message))
+
+    if len(failed) > 0:
+        with _lock:
+            _queue[:0] = failed
+
+    return written
+
+
+def _write_behind():
+    while True:
+        _flush_event.wait(FLUSH_INTERVAL)
+        _flush_event.clear()
+        try:
+            flush_chat_messages()
+        except Exception as e:
+            print("Could not write chat messages: %s" % e)
+
+
+def _start_writer():
+    global _writer
+    if _writer is None:
+        _writer = socketio.start_background_task(_write_behind)
+
+
+atexit.register(flush_chat_messages)
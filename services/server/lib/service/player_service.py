@@ -1,8 +1,9 @@
 import copy
 import re
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload, undefer
 from werkzeug.exceptions import BadRequest, Unauthorized
 
 from lib.database import request_session
@@ -22,6 +23,54 @@ def get_players(campaign: CampaignModel) -> List[PlayerModel]:
     return players
 
 
+def get_roster(campaign: CampaignModel) -> Tuple[List[PlayerModel], Dict[int, ClassModel]]:
+    """
+    Loads all players of a campaign, their owners and all classes referenced by the players
+    using a fixed number of queries, regardless of the amount of players.
+
+    :param campaign: The campaign for which to load the players.
+    :return: A tuple (players, classes by id)
+    """
+    campaign_id = None if campaign.name == "test--" else campaign.id
+    players = player_repository.get_players_with_owners(campaign_id)
+
+    class_ids = set()
+    for player in players:
+        player.backstory = striphtml(player.backstory or "")
+        class_ids.update((player.info or {}).get("class_ids", []))
+
+    classes = player_repository.get_classes_by_ids(list(class_ids))
+    return players, {cls.id: cls for cls in classes}
+
+
+def roster_to_json(user: UserModel, campaign: CampaignModel, players: List[PlayerModel],
+                   classes: Dict[int, ClassModel]) -> List[dict]:
+    """
+    Serializes the players loaded by `get_roster` without issuing any further queries.
+    Backstories are only visible to the owner of the player and the dm of the campaign.
+
+    :param user: The user requesting the roster.
+    :param campaign: The campaign the roster belongs to.
+    :param players: The players of the campaign.
+    :param classes: The classes referenced by the players, by id.
+    :return: A list of serialized players.
+    """
+    data = []
+    for player in players:
+        player_classes = [classes[class_id] for class_id in (player.info or {}).get("class_ids", [])
+                          if class_id in classes]
+
+        player_json = player.to_json()
+        player_json["class"] = player_classes[0].name if len(player_classes) > 0 else "Classless"
+
+        # Make sure you can only see your own backstory, or if you are the dm.
+        if player.owner_id != user.id and campaign.user_id != user.id:
+            player_json["backstory"] = ""
+
+        data.append(player_json)
+    return data
+
+
 def striphtml(data):
     p = re.compile(r'<.*?>')
     return p.sub('', data)
@@ -116,7 +165,7 @@ def get_user_players_by_id(user: UserModel, campaign_id: int) -> List[PlayerMode
     players = player_repository.get_players(campaign_id)
     user_players = []
     for player in players:
-        if player.owner == user:
+        if player.owner_id == user.id:
             user_players.append(player)
     return user_players
 
@@ -189,6 +238,7 @@ def get_player_spells(player: PlayerModel) -> List[PlayerSpellModel]:
     db = request_session()
 
     return db.query(PlayerSpellModel) \
+        .options(joinedload(PlayerSpellModel.spell).undefer(SpellModel.description)) \
         .filter(PlayerSpellModel.player_id == player.id) \
         .all()
 
@@ -196,10 +246,33 @@ def get_player_spells(player: PlayerModel) -> List[PlayerSpellModel]:
 def get_spells(user=None):
     db = request_session()
     return db.query(SpellModel) \
+        .options(undefer(SpellModel.description)) \
         .filter(or_(user.id == SpellModel.owner_id, SpellModel.owner_id == -1)) \
         .all()
 
 
+def get_base_spells() -> List[SpellModel]:
+    """
+    Returns the spells from the base game, which have no owner.
+    """
+    db = request_session()
+    return db.query(SpellModel) \
+        .options(undefer(SpellModel.description)) \
+        .filter(or_(SpellModel.owner_id.is_(None), SpellModel.owner_id == -1)) \
+        .all()
+
+
+def get_user_spells(user: UserModel) -> List[SpellModel]:
+    """
+    Returns the custom spells created by the user.
+    """
+    db = request_session()
+    return db.query(SpellModel) \
+        .options(undefer(SpellModel.description)) \
+        .filter(SpellModel.owner_id == user.id) \
+        .all()
+
+
 def get_spell(player: PlayerModel, spell_id: int):
     return player_repository.get_spell(player, spell_id)
 
@@ -228,7 +301,7 @@ def delete_player_spell(user: UserModel, player: PlayerModel, spell_id: int):
     :param spell_id:
     :return:
     """
-    if player.owner is not user:
+    if player.owner_id != user.id:
         raise Unauthorized("This player does not belong to you.")
 
     spell = get_spell(player, spell_id)
@@ -241,7 +314,7 @@ def delete_player_spell(user: UserModel, player: PlayerModel, spell_id: int):
 
 
 def delete_player_item(user, player, item_id):
-    if player.owner is not user:
+    if player.owner_id != user.id:
         return "This player does not belong to you."
 
     player_repository.delete_equipment(player, item_id)
@@ -266,6 +339,7 @@ def get_classes(player: PlayerModel) -> List[ClassModel]:
     db = request_session()
 
     return (db.query(ClassModel)
+            .options(undefer(ClassModel.data))
             .filter(ClassModel.id.in_(player.info["class_ids"]))
             .all())
 
@@ -284,6 +358,7 @@ def get_visible_classes(user: UserModel) -> List[ClassModel]:
     user_id = user.id if user is not None else -1
 
     return (db.query(ClassModel)
+            .options(undefer(ClassModel.data))
             .filter(ClassModel.owner_id == user_id or ClassModel.owner_id.is_(None))
             .all())
 
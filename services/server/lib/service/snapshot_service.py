@@ -0,0 +1,268 @@
+"""
+Exports and loads snapshots of the base game reference data; classes, spells, items, races and backgrounds.
+
+A snapshot is a gzip compressed JSON Lines file. The first line is a header with the format version and,
+for every table, its columns, row count and SHA-256 checksum. Every following line is a row in the form
+[table name, [values in column order]]. Rows are streamed, so a snapshot is never fully loaded in memory.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import or_, select, bindparam, func
+
+from lib.database import request_session
+from lib.model.class_models import ClassModel
+from lib.model.models import SpellModel, ItemModel, RaceModel, BackgroundModel
+from lib.utils import reference_cache
+
+FORMAT = "dnd-reference-snapshot"
+FORMAT_VERSION = 1
+
+BATCH_SIZE = 500
+
+SNAPSHOT_MODELS = {
+    "class": ClassModel,
+    "spell": SpellModel,
+    "item": ItemModel,
+    "race": RaceModel,
+    "background": BackgroundModel,
+}
+
+_CACHE_KEYS = {
+    "class": reference_cache.CLASSES,
+    "spell": reference_cache.SPELLS,
+    "race": reference_cache.RACES,
+    "background": reference_cache.BACKGROUNDS,
+}
+
+
+def _encode_row(values: List) -> bytes:
+    return json.dumps(values, sort_keys=True, separators=(",", ":")).encode("utf8") + b"\n"
+
+
+def _base_rows(table_name: str, columns: List[str]) -> Iterable[List]:
+    """
+    Yields the values of the base game rows (without owner) of a table, ordered by id.
+    """
+    table = SNAPSHOT_MODELS[table_name].__table__
+    query = select(*[table.c[column] for column in columns]) \
+        .where(or_(table.c.owner_id.is_(None), table.c.owner_id == -1)) \
+        .order_by(table.c.id)
+
+    for row in request_session().execute(query):
+        yield list(row)
+
+
+def _checksum(table_name: str, columns: List[str], ids: Set[int] = None) -> (str, int):
+    """
+    :param ids: Only the rows with these ids are included, all base game rows by default.
+    """
+    id_index = columns.index("id")
+    digest = hashlib.sha256()
+    count = 0
+    for values in _base_rows(table_name, columns):
+        if ids is None or values[id_index] in ids:
+            digest.update(_encode_row(values))
+            count += 1
+    return digest.hexdigest(), count
+
+
+def _custom_ids(table_name: str) -> Set[int]:
+    """
+    Returns the ids of the custom rows of users in a table, these rows are never overwritten by a snapshot.
+    """
+    table = SNAPSHOT_MODELS[table_name].__table__
+    query = select(table.c.id).where(table.c.owner_id.isnot(None)).where(table.c.owner_id != -1)
+    return {row_id for row_id, in request_session().execute(query)}
+
+
+def _up_to_date_tables(path: str, header: dict) -> Set[str]:
+    """
+    Returns the tables of a snapshot of which the database already contains the rows.
+    The rows of the snapshot are compared with the base game rows with the same ids, so base game rows which are
+    not in the snapshot do not matter. Rows of which the id is used by a custom row are left out on both sides,
+    as they are never loaded. Only the ids of the rows are kept in memory.
+    """
+    custom_ids = {table_name: _custom_ids(table_name) for table_name in header["tables"]}
+    digests = {table_name: hashlib.sha256() for table_name in header["tables"]}
+    ids = {table_name: set() for table_name in header["tables"]}
+
+    with gzip.open(path, "rb") as f:
+        _read_header(f)
+        for line in f:
+            table_name, values = json.loads(line)
+            row_id = values[header["tables"][table_name]["columns"].index("id")]
+            if row_id not in custom_ids[table_name]:
+                digests[table_name].update(_encode_row(values))
+                ids[table_name].add(row_id)
+
+    return {table_name for table_name, info in header["tables"].items()
+            if _checksum(table_name, info["columns"], ids[table_name])
+            == (digests[table_name].hexdigest(), len(ids[table_name]))}
+
+
+def export_snapshot(path: str, table_names: List[str] = None) -> dict:
+    """
+    Exports the base game rows of the reference tables to a snapshot file.
+
+    :param path: The snapshot file to write.
+    :param table_names: The tables to export, defaults to all reference tables.
+    :return: The header of the snapshot.
+    """
+    tables = {}
+    for table_name in table_names or SNAPSHOT_MODELS.keys():
+        columns = [column.name for column in SNAPSHOT_MODELS[table_name].__table__.columns]
+        checksum, count = _checksum(table_name, columns)
+        tables[table_name] = {"columns": columns, "rows": count, "sha256": checksum}
+
+    header = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "created": datetime.datetime.now().isoformat(),
+        "tables": tables,
+    }
+
+    with gzip.open(path, "wb") as f:
+        f.write(json.dumps(header).encode("utf8") + b"\n")
+        for table_name, info in tables.items():
+            for values in _base_rows(table_name, info["columns"]):
+                f.write(json.dumps([table_name, values], separators=(",", ":")).encode("utf8") + b"\n")
+
+    return header
+
+
+def _read_header(f) -> dict:
+    header = json.loads(f.readline())
+    if header.get("format") != FORMAT:
+        raise ValueError("This file is not a reference data snapshot.")
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError("Unsupported snapshot version %s." % header.get("version"))
+    return header
+
+
+class _TableLoader:
+    """
+    Upserts the rows of one snapshot table in batches, and verifies the checksum of the streamed rows.
+    Nothing is committed until the checksum matches.
+    """
+
+    def __init__(self, table_name: str, info: dict):
+        self.table_name = table_name
+        self.info = info
+        self.table = SNAPSHOT_MODELS[table_name].__table__
+        self.columns = info["columns"]
+        self.digest = hashlib.sha256()
+        self.count = 0
+        self.inserts = []
+        self.updates = []
+        self.skipped = 0
+        self.inserted = 0
+
+        db = request_session()
+        self.base_ids = set()
+        self.other_ids = set()
+        for row_id, owner_id in db.execute(select(self.table.c.id, self.table.c.owner_id)):
+            (self.base_ids if owner_id is None or owner_id == -1 else self.other_ids).add(row_id)
+
+    def add(self, values: List):
+        self.digest.update(_encode_row(values))
+        self.count += 1
+
+        row = {column: value for column, value in zip(self.columns, values) if column in self.table.c}
+        row_id = row.get("id")
+        if row_id in self.other_ids:
+            # The id is in use by a custom row of a user, which is never overwritten.
+            self.skipped += 1
+        elif row_id in self.base_ids:
+            row["_id"] = row.pop("id")
+            self.updates.append(row)
+        else:
+            self.inserts.append(row)
+
+        if len(self.inserts) + len(self.updates) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        db = request_session()
+        if self.inserts:
+            db.execute(self.table.insert(), self.inserts)
+            self.inserted += len(self.inserts)
+            self.inserts = []
+        if self.updates:
+            columns = [column for column in self.updates[0].keys() if column != "_id"]
+            statement = self.table.update() \
+                .where(self.table.c.id == bindparam("_id")) \
+                .values({column: bindparam(column) for column in columns})
+            db.execute(statement, self.updates)
+            self.updates = []
+
+    def finish(self):
+        self.flush()
+        db = request_session()
+        if self.count != self.info["rows"] or self.digest.hexdigest() != self.info["sha256"]:
+            db.rollback()
+            raise ValueError("Checksum mismatch for table %s, the snapshot is corrupt." % self.table_name)
+
+        if self.inserted > 0 and db.get_bind().dialect.name == "postgresql":
+            # Rows inserted with their id do not advance the id sequence, the next new row would reuse an id.
+            db.execute(select(func.setval(func.pg_get_serial_sequence(self.table.name, "id"),
+                                          select(func.max(self.table.c.id)).scalar_subquery())))
+        db.commit()
+
+        if self.table_name in _CACHE_KEYS:
+            reference_cache.invalidate(_CACHE_KEYS[self.table_name])
+
+
+def load_snapshot(path: str) -> Dict[str, str]:
+    """
+    Loads a snapshot into the database. Tables of which the base game rows already match the rows of the snapshot
+    are skipped, see `_up_to_date_tables`. Rows are matched by id; existing base game rows are updated and missing rows are inserted.
+
+    :param path: The snapshot file.
+    :return: The status per table; "up to date" or the amount of loaded rows.
+    :raises: ValueError if the file is not a valid snapshot, or a table checksum does not match.
+    """
+    status = {}
+    with gzip.open(path, "rb") as f:
+        header = _read_header(f)
+
+        for table_name in header["tables"]:
+            if table_name not in SNAPSHOT_MODELS:
+                raise ValueError("Unknown table %s in snapshot." % table_name)
+
+        up_to_date = _up_to_date_tables(path, header)
+        loaders = {}
+        for table_name in header["tables"]:
+            if table_name in up_to_date:
+                status[table_name] = "up to date"
+            else:
+                loaders[table_name] = None
+
+        current = None
+        for line in f:
+            table_name, values = json.loads(line)
+            if table_name not in loaders:
+                continue
+
+            if current is None or current.table_name != table_name:
+                if current is not None:
+                    current.finish()
+                current = _TableLoader(table_name, header["tables"][table_name])
+                loaders[table_name] = current
+            current.add(values)
+
+        if current is not None:
+            current.finish()
+
+        for table_name, loader in loaders.items():
+            if loader is None:
+                # The snapshot contains no rows for this table.
+                loader = _TableLoader(table_name, header["tables"][table_name])
+                loader.finish()
+            status[table_name] = "loaded %d rows, skipped %d" % (loader.count, loader.skipped)
+
+    return status
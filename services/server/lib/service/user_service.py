@@ -4,7 +4,6 @@ import string
 from random import randint
 from typing import Optional
 
-import bcrypt as bcrypt
 import flask
 from werkzeug.exceptions import BadRequest
 
@@ -12,7 +11,9 @@ from lib.database import request_session
 from services.server import app
 from lib.model.models import UserModel, EmailResetModel, SpellModel
 from lib.repository import user_repository
-from lib.user_session import session_user_set
+from lib.service import email_service
+from lib.user_session import session_user_set, revoke_connections, invalidate_user
+from lib.utils import password_utils, reference_cache
 
 ALLOWED_CHARS = string.digits + string.ascii_letters
 
@@ -22,9 +23,17 @@ def login(username, password):
     if user is None:
         raise BadRequest("This username does not exist.")
 
-    if not (user.name == username and bcrypt.checkpw(password.encode(), user.password)):
+    # Hashing takes long, a connection held meanwhile would starve the pool under concurrent logins.
+    hashed_pw = user.password
+    user_repository.release_user(user)
+
+    if not (user.name == username and password_utils.check_password(password, hashed_pw)):
         raise BadRequest("Password incorrect.")
 
+    # Upgrade the hash when the cost factor was changed.
+    if password_utils.needs_rehash(hashed_pw):
+        user_repository.update_password(user.id, password_utils.hash_password(password))
+
     session_user_set(user)
     return user
 
@@ -43,7 +52,7 @@ def create_user(username, password, email):
     if find_user_by_email(email) is not None:
         raise BadRequest("This email address is already in use.")
 
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pw = password_utils.hash_password(password)
 
     user = UserModel(name=username, email=email)
     user.password = hashed_pw
@@ -79,6 +88,7 @@ def reset_password(email: str) -> str:
     content = flask.render_template("reset_email.html", code=code, host=app.host, port=app.port)
 
     user_repository.send_email(user, content, "Reset your password")
+    email_service.wake_sender()
     return ""
 
 
@@ -107,10 +117,12 @@ def find_usermodel_with_code(code: str) -> (str, Optional[UserModel]):
 
 
 def set_password(user: UserModel, password: str) -> str:
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pw = password_utils.hash_password(password)
     user.password = hashed_pw
 
     user_repository.add(user)
+    invalidate_user(user.id)
+    revoke_connections(user.id)
     return ""
 
 
@@ -145,4 +157,5 @@ def create_spell(user, data):
 
     session.add(spell)
     session.commit()
+    reference_cache.invalidate(reference_cache.SPELLS)
     return spell
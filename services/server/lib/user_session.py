@@ -2,25 +2,117 @@
 Credits to florens, code from project conexus.
 """
 
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
 
-from flask import session, g as flaskg
+from flask import session, request, has_request_context, g as flaskg
 
 from lib.model.models import UserModel
 from lib.repository import user_repository
 
 
-def session_user() -> UserModel:
+class UserSnapshot(NamedTuple):
     """
-    Return the current authenticated user.
+    An immutable copy of the identity of a user, which can be used outside of a database session.
+    """
+    id: int
+    name: str
+    email: Optional[str]
+
+    @staticmethod
+    def of(user: UserModel) -> "UserSnapshot":
+        return UserSnapshot(id=user.id, name=user.name, email=user.email)
+
+
+# The snapshots of recently authenticated users are cached in this process, at most
+# USER_CACHE_SIZE users for at most USER_CACHE_TTL seconds.
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+
+_user_cache_lock = threading.Lock()
+_user_cache: "OrderedDict[int, Tuple[float, UserSnapshot]]" = OrderedDict()
+_user_cache_stats = {"hits": 0, "misses": 0}
+
+_connections_lock = threading.Lock()
+# The user of every authenticated socket connection by connection id, None once the user is revoked.
+_connection_users: Dict[str, Optional[UserSnapshot]] = {}
+
+
+def _connection_id() -> Optional[str]:
+    """
+    Returns the id of the socket connection of the current event, or None for HTTP requests.
+    """
+    if not has_request_context():
+        return None
+    return getattr(request, 'sid', None)
+
+
+def find_user(user_id: int) -> Optional[UserSnapshot]:
+    """
+    Returns the snapshot of a user from the user cache, loading it if it is not cached or expired.
+    """
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _user_cache.move_to_end(user_id)
+            _user_cache_stats["hits"] += 1
+            return entry[1]
+        _user_cache_stats["misses"] += 1
+
+    user = user_repository.find_user_by_id(user_id)
+    if user is None:
+        return None
+
+    snapshot = UserSnapshot.of(user)
+    with _user_cache_lock:
+        _user_cache[user_id] = (now + USER_CACHE_TTL, snapshot)
+        _user_cache.move_to_end(user_id)
+        while len(_user_cache) > USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate_user(user_id: int):
+    """
+    Removes a user from the user cache, this has to be called whenever the account of a user changes.
+    """
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+def user_cache_statistics() -> dict:
+    with _user_cache_lock:
+        return {
+            "size": len(_user_cache),
+            "max_size": USER_CACHE_SIZE,
+            "ttl": USER_CACHE_TTL,
+            "hits": _user_cache_stats["hits"],
+            "misses": _user_cache_stats["misses"],
+        }
+
+
+def session_user() -> UserSnapshot:
+    """
+    Return the current authenticated user, as an immutable snapshot from the user cache.
+    In socket events this is the snapshot of the user which was stored when the connection was made.
     :return: the current authenticated user.
     :raises: ValueError if no user is logged in.
     """
 
+    sid = _connection_id()
+    if sid is not None and sid in _connection_users:
+        user = _connection_users[sid]
+        if user is None:
+            raise ValueError('No user logged in')
+        return user
+
     user_id = session['user_id'] if 'user_id' in session else None
     if user_id is not None:
         if not hasattr(flaskg, 'session_user'):
-            flaskg.session_user = user_repository.find_user_by_id(user_id)
+            flaskg.session_user = find_user(user_id)
 
             if flaskg.session_user is None:
                 del session['user_id']
@@ -34,6 +126,10 @@ def session_is_authed():
     Checks if the session is authorized.
     :return:
     """
+    sid = _connection_id()
+    if sid is not None and sid in _connection_users:
+        return _connection_users[sid] is not None
+
     if 'user_id' not in session:
         return False
 
@@ -50,6 +146,42 @@ def session_user_set(user: Optional[UserModel]):
 
     if user is None:
         if 'user_id' in session:
+            revoke_connections(session['user_id'])
             del session['user_id']
     else:
         session['user_id'] = user.id
+
+
+def connect_socket():
+    """
+    Stores the user of a new socket connection, so the events of the connection do not query the user.
+    Has to be called when a socket connects.
+    """
+    sid = _connection_id()
+    user_id = session.get('user_id')
+    if sid is None or user_id is None:
+        return
+
+    user = find_user(user_id)
+    with _connections_lock:
+        _connection_users[sid] = user
+
+
+def disconnect_socket():
+    """
+    Removes the user of a socket connection, has to be called when a socket disconnects.
+    """
+    sid = _connection_id()
+    with _connections_lock:
+        _connection_users.pop(sid, None)
+
+
+def revoke_connections(user_id: int):
+    """
+    Logs out all socket connections of a user. This has to be called when the user logs out
+    or changes their password, the connections have to reconnect to authenticate again.
+    """
+    with _connections_lock:
+        for sid, user in _connection_users.items():
+            if user is not None and user.id == user_id:
+                _connection_users[sid] = None
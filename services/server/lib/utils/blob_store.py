@@ -0,0 +1,57 @@
+"""
+A content-addressed blob store on the local disk.
+
+Blobs are stored under their SHA-256 hash, in a directory named after the first two characters of the hash.
+Storing the same content twice results in a single file.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Tuple
+
+_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def blob_path(root: str, blob_hash: str) -> str:
+    """
+    Returns the path of a blob in the store.
+
+    :raises: ValueError if the hash is not a valid SHA-256 hex digest.
+    """
+    if not _HASH_PATTERN.match(blob_hash):
+        raise ValueError("Invalid blob hash.")
+    return os.path.join(root, blob_hash[:2], blob_hash)
+
+
+def put(root: str, data: bytes) -> Tuple[str, int]:
+    """
+    Stores the data in the blob store, if it is not stored already.
+
+    :param root: The root directory of the blob store.
+    :param data: The content of the blob.
+    :return: A tuple (hash, size)
+    """
+    blob_hash = hashlib.sha256(data).hexdigest()
+    path = blob_path(root, blob_hash)
+
+    if not os.path.isfile(path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first, so a blob is never visible while partially written.
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    return blob_hash, len(data)
+
+
+def exists(root: str, blob_hash: str) -> bool:
+    return os.path.isfile(blob_path(root, blob_hash))
@@ -0,0 +1,51 @@
+"""
+Negotiated compression of response bodies with brotli or gzip.
+
+Brotli is used when the brotli package is installed and the client accepts it, otherwise gzip.
+Bodies which are compressed on every request use fast levels, bodies which are compressed once and then
+cached use the levels with the best ratio that still compress a large catalog within a fraction of a second.
+"""
+
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies fit in a few packets anyway, compressing them costs more than it saves.
+MIN_SIZE = 1024
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 9
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """
+    Chooses the content encoding for a response.
+
+    :param accept_encodings: The parsed Accept-Encoding header, `request.accept_encodings`.
+    :return: "br", "gzip" or None if the client accepts neither.
+    """
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    """
+    Compresses a body with the given encoding from `choose_encoding`.
+
+    :param cached: Whether the compressed body is cached, it is then compressed with a higher level.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY)
+    if encoding == "gzip":
+        # No modification time, so compressing the same body twice results in the same bytes.
+        return gzip.compress(body, compresslevel=CACHED_GZIP_LEVEL if cached else GZIP_LEVEL, mtime=0)
+    raise ValueError("Unknown content encoding %s" % encoding)
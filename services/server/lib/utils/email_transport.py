@@ -0,0 +1,104 @@
+"""
+Transports which deliver the emails of the email outbox.
+
+The transport is configured as `transport` in the [email] section of config.ini:
+    smtp            Sends through the configured SMTP server over SSL, this is the default.
+    file:<dir>      Writes every email as an .eml file to the directory, for development.
+    memory          Keeps the emails in `MemoryTransport.sent`, for tests.
+"""
+
+import os
+import smtplib
+import time
+from email.message import Message
+from typing import List
+
+
+class SMTPTransport:
+    """
+    Sends emails over a single SMTP connection, which is reused until the transport is closed
+    or the server drops it.
+    """
+
+    def __init__(self, server: str, address: str, password: str, port: int = 465, timeout: int = 30):
+        self.server = server
+        self.address = address
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self) -> smtplib.SMTP_SSL:
+        if self._connection is None:
+            connection = smtplib.SMTP_SSL(self.server, self.port, timeout=self.timeout)
+            connection.ehlo()
+            connection.login(self.address, self.password)
+            self._connection = connection
+        return self._connection
+
+    def send(self, recipient: str, message: Message):
+        try:
+            self._connect().sendmail(self.address, recipient, message.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The server closed the idle connection, reconnect once.
+            self._connection = None
+            self._connect().sendmail(self.address, recipient, message.as_string())
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except Exception:
+                pass
+            self._connection = None
+
+
+class FileTransport:
+    """
+    Writes every email as an .eml file to a directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, recipient: str, message: Message):
+        filename = "%d_%s.eml" % (time.time() * 1000000, recipient.replace(os.sep, "_"))
+        with open(os.path.join(self.directory, filename), "w", encoding="utf8") as f:
+            f.write(message.as_string())
+
+    def close(self):
+        pass
+
+
+class MemoryTransport:
+    """
+    Keeps every email in memory, as a list of (recipient, message) tuples.
+    """
+
+    def __init__(self):
+        self.sent: List = []
+
+    def send(self, recipient: str, message: Message):
+        self.sent.append((recipient, message))
+
+    def close(self):
+        pass
+
+
+def create_transport(name: str, server: str, address: str, password: str):
+    """
+    Creates the transport with the given name, see the module documentation.
+
+    :raises: ValueError if the transport is unknown.
+    """
+    if name is None or name == "smtp":
+        return SMTPTransport(server, address, password)
+    if name.startswith("file:"):
+        return FileTransport(name[len("file:"):])
+    if name == "memory":
+        return MemoryTransport()
+    raise ValueError("Unknown email transport %s" % name)
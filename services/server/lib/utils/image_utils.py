@@ -1,13 +1,38 @@
+import io
+import json
+import math
+import multiprocessing
 import os
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
 
 from PIL import Image
 
+# Images are decoded and encoded in separate processes, so large uploads do not block the event loop.
+IMAGE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
 
-def resize_image(filename: str) -> None:
+TILE_SIZE = 256
+TILE_FORMAT = "webp"
+THUMBNAIL_SIZE = 256
+IMAGE_SIZES = [512, 1024]
+
+# Formats of uploaded images which are stored and served as they are, their mime type is taken from the image.
+ALLOWED_FORMATS = ("PNG", "JPEG", "WEBP")
+Image.init()
+ALLOWED_MIME_TYPES = tuple(Image.MIME[image_format] for image_format in ALLOWED_FORMATS)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def resize_image(filename: str, destination: Optional[str] = None) -> None:
     """
     Reduces an image size
 
     :param filename:
+    :param destination: Where to store the resized image, defaults to overwriting the original file.
     :return:
     """
 
@@ -20,11 +45,140 @@ def resize_image(filename: str) -> None:
     else:
         ratio = width / height
         new_image = image.resize((int(ratio * 1500), 1500))
-    new_image.save(filename)
+    new_image.save(destination or filename)
+
+
+def identify_image(data: bytes) -> Tuple[str, int, int]:
+    """
+    Returns the (mime type, width, height) of an encoded image, only the image header is decoded.
+
+    :raises: ValueError if the data is not an image in one of the allowed formats.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ValueError("Images must be PNG, JPEG or WebP.")
+            return Image.MIME[image.format], image.width, image.height
+    except OSError:
+        raise ValueError("The image is not a valid image.")
+
+
+def pyramid_directory(filename: str) -> str:
+    """
+    Returns the directory containing the thumbnail, sizes and tiles of an image.
+    """
+    return os.path.splitext(filename)[0] + "_files"
+
+
+def create_image_pyramid(filename: str) -> dict:
+    """
+    Creates a thumbnail, several downscaled sizes and a deep zoom tile pyramid of an image,
+    in the directory returned by `pyramid_directory`.
+    Tiles are stored as `<level>/<column>_<row>.webp`. The highest level contains the image in full
+    resolution, every level below is half the size of the level above, down to level 0 which is 1x1 pixel.
+
+    :param filename:
+    :return: The pyramid description, which is also stored as `info.json` in the pyramid directory.
+    """
+    directory = pyramid_directory(filename)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    image = Image.open(filename)
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    width, height = image.size
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    thumbnail.save(os.path.join(directory, "thumbnail." + TILE_FORMAT))
+
+    sizes = []
+    for size in IMAGE_SIZES:
+        if size >= max(width, height):
+            continue
+        scaled = image.copy()
+        scaled.thumbnail((size, size))
+        scaled.save(os.path.join(directory, "%d.%s" % (size, TILE_FORMAT)))
+        sizes.append(size)
+
+    max_level = int(math.ceil(math.log2(max(width, height, 1))))
+    level_image = image
+    for level in range(max_level, -1, -1):
+        level_directory = os.path.join(directory, str(level))
+        os.makedirs(level_directory)
+
+        level_width, level_height = level_image.size
+        for column in range(int(math.ceil(level_width / TILE_SIZE))):
+            for row in range(int(math.ceil(level_height / TILE_SIZE))):
+                box = (column * TILE_SIZE, row * TILE_SIZE,
+                       min((column + 1) * TILE_SIZE, level_width), min((row + 1) * TILE_SIZE, level_height))
+                level_image.crop(box).save(os.path.join(level_directory, "%d_%d.%s" % (column, row, TILE_FORMAT)))
+
+        # Every next level is created from the previous level, which is much cheaper than from the original.
+        level_image = level_image.resize((max(1, int(math.ceil(level_width / 2))),
+                                          max(1, int(math.ceil(level_height / 2)))))
+
+    info = {
+        "width": width,
+        "height": height,
+        "tile_size": TILE_SIZE,
+        "format": TILE_FORMAT,
+        "max_level": max_level,
+        "sizes": sizes,
+    }
+    with open(os.path.join(directory, "info.json"), "w") as f:
+        json.dump(info, f)
+
+    return info
+
+
+def process_map_image(filename: str, destination: str) -> dict:
+    """
+    Creates the resized master image of an uploaded map, and its tile pyramid.
+
+    :param filename: The uploaded image.
+    :param destination: Where to store the resized master image.
+    :return: The pyramid description.
+    """
+    resize_image(filename, destination)
+    return create_image_pyramid(destination)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # Use spawn, forking a monkey patched gevent process is not safe.
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def resize_image_async(filename: str, destination: Optional[str] = None) -> Future:
+    """
+    Resizes an image in the image worker pool.
+
+    :param filename:
+    :param destination: Where to store the resized image, defaults to overwriting the original file.
+    :return: A future which is done when the resized image is stored.
+    """
+    return _get_executor().submit(resize_image, filename, destination)
+
+
+def process_map_image_async(filename: str, destination: str) -> Future:
+    """
+    Runs `process_map_image` in the image worker pool.
+
+    :return: A future which is done when the master image and its tile pyramid are stored.
+    """
+    return _get_executor().submit(process_map_image, filename, destination)
 
 
 if __name__ == "__main__":
     root_path = "../../../client/public/static/images/uploads/"
     for path in os.listdir(root_path):
         if os.path.isfile(root_path + path):
-            resize_image(root_path + path)
\ No newline at end of file
+            resize_image(root_path + path)
+            create_image_pyramid(root_path + path)
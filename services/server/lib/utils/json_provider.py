@@ -0,0 +1,52 @@
+"""
+The JSON provider of the app, which encodes responses with orjson when it is installed.
+
+The output is the same JSON as that of the default provider of Flask, with sorted keys and dates as HTTP dates,
+except that non ASCII characters are written as UTF-8 instead of escaped. Values orjson can not encode, and calls
+with options such as an indent, are left to the default provider.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Dates are passed to the default function, which formats them as HTTP dates like the default provider does.
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+class JSONProvider(DefaultJSONProvider):
+
+    def _encode(self, obj, **kwargs):
+        """
+        :return: The encoded object as bytes, or None if it has to be encoded by the default provider.
+        """
+        if orjson is None or any(key != "separators" for key in kwargs):
+            return None
+        if kwargs.get("separators", (",", ":")) != (",", ":"):
+            return None
+
+        options = _OPTIONS | orjson.OPT_SORT_KEYS if self.sort_keys else _OPTIONS
+        try:
+            return orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:
+            # Such as integers above 64 bits, or named tuples.
+            return None
+
+    def dumps(self, obj, **kwargs) -> str:
+        body = self._encode(obj, **kwargs)
+        if body is None:
+            return super().dumps(obj, **kwargs)
+        return body.decode("utf8")
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self._encode(obj)
+        if body is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
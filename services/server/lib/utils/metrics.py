@@ -0,0 +1,178 @@
+"""
+Request metrics of this process, exposed in the Prometheus text format on /metrics.
+
+For every API route and socket event the wall time, the amount and duration of the database queries,
+and for routes the response size, are recorded in histograms. Queries are attributed to the request or
+event running in the same thread or greenlet, through the SQLAlchemy cursor events.
+"""
+
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304]
+
+_lock = threading.Lock()
+# Greenlet local under gevent, as the threading module is monkey patched.
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...], buckets: List[float]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: Dict[Tuple, List] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        with _lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Counts per bucket, followed by the sum and the total count.
+                series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = ["# HELP %s %s" % (self.name, self.description), "# TYPE %s histogram" % self.name]
+        with _lock:
+            series = [(labels, list(values)) for labels, values in self.series.items()]
+
+        for labels, values in sorted(series):
+            label_pairs = list(zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, values):
+                lines.append("%s_bucket%s %d" % (self.name, _labels(label_pairs + [("le", _number(bound))]), count))
+            lines.append("%s_bucket%s %d" % (self.name, _labels(label_pairs + [("le", "+Inf")]), values[-1]))
+            lines.append("%s_sum%s %s" % (self.name, _labels(label_pairs), _number(values[-2])))
+            lines.append("%s_count%s %d" % (self.name, _labels(label_pairs), values[-1]))
+        return lines
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join("%s=\"%s\"" % (name, _escape(value)) for name, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram("dndool_request_duration_seconds", "Wall time of API requests.",
+                             ("route", "method", "status"), DURATION_BUCKETS)
+REQUEST_QUERIES = Histogram("dndool_request_queries", "Database queries per API request.",
+                            ("route", "method"), QUERY_BUCKETS)
+REQUEST_QUERY_DURATION = Histogram("dndool_request_query_duration_seconds",
+                                   "Total database query time per API request.",
+                                   ("route", "method"), DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram("dndool_response_size_bytes", "Size of API response bodies.",
+                          ("route", "method"), SIZE_BUCKETS)
+EVENT_DURATION = Histogram("dndool_socket_event_duration_seconds", "Wall time of socket event handlers.",
+                           ("event",), DURATION_BUCKETS)
+EVENT_QUERIES = Histogram("dndool_socket_event_queries", "Database queries per socket event.",
+                          ("event",), QUERY_BUCKETS)
+
+HISTOGRAMS = [REQUEST_DURATION, REQUEST_QUERIES, REQUEST_QUERY_DURATION, RESPONSE_SIZE, EVENT_DURATION,
+              EVENT_QUERIES]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+
+    queries = getattr(_local, "queries", None)
+    if queries is not None:
+        queries[0] += 1
+        queries[1] += duration
+
+
+def start_measurement():
+    """
+    Starts measuring the wall time and queries of the request or event in this thread or greenlet.
+    """
+    _local.start = time.perf_counter()
+    _local.queries = [0, 0.0]
+
+
+def stop_measurement() -> Optional[Tuple[float, int, float]]:
+    """
+    Stops the measurement of this thread or greenlet.
+
+    :return: A tuple (wall time, query count, query time), or None if no measurement was started.
+    """
+    queries = getattr(_local, "queries", None)
+    if queries is None:
+        return None
+
+    _local.queries = None
+    return time.perf_counter() - _local.start, queries[0], queries[1]
+
+
+def record_request(route: str, method: str, status: int, response_size: int):
+    measurement = stop_measurement()
+    if measurement is None:
+        return
+
+    duration, query_count, query_time = measurement
+    REQUEST_DURATION.observe((route, method, str(status)), duration)
+    REQUEST_QUERIES.observe((route, method), query_count)
+    REQUEST_QUERY_DURATION.observe((route, method), query_time)
+    RESPONSE_SIZE.observe((route, method), response_size)
+
+
+def socket_event(name: str):
+    """
+    Add this decorator to a socket event handler, below `socketio.on`, to record its metrics.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            start_measurement()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                measurement = stop_measurement()
+                if measurement is not None:
+                    EVENT_DURATION.observe((name,), measurement[0])
+                    EVENT_QUERIES.observe((name,), measurement[1])
+
+        return decorated_function
+
+    return decorator
+
+
+def render(gauges: Dict[str, float] = None) -> str:
+    """
+    Renders all histograms, and the given gauges, in the Prometheus text format.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for name, value in (gauges or {}).items():
+        lines.append("# TYPE %s gauge" % name)
+        lines.append("%s %s" % (name, _number(value)))
+    return "\n".join(lines) + "\n"
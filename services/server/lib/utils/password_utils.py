@@ -0,0 +1,82 @@
+"""
+Password hashing with bcrypt on a pool of native threads.
+
+A bcrypt hash blocks the calling thread for its whole duration. When the server runs on gevent that thread
+runs every greenlet, so all websockets would freeze during a login. The hashes are therefore computed on a
+gevent thread pool, which lets the other greenlets run while waiting. Without gevent a regular thread pool
+is used, bcrypt releases the GIL so the hashes run in parallel in both cases.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+PASSWORD_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# The bcrypt cost factor of new hashes, every increment doubles the time of a hash.
+DEFAULT_ROUNDS = 12
+_rounds = DEFAULT_ROUNDS
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def set_rounds(rounds: int):
+    """
+    Sets the bcrypt cost factor of new hashes.
+
+    :raises: ValueError if the cost factor is not supported by bcrypt.
+    """
+    global _rounds
+
+    if not 4 <= rounds <= 31:
+        raise ValueError("The bcrypt cost factor has to be between 4 and 31.")
+    _rounds = rounds
+
+
+def _is_gevent_patched() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+def _get_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            if _is_gevent_patched():
+                from gevent.threadpool import ThreadPool
+                _pool = ThreadPool(PASSWORD_WORKERS)
+            else:
+                _pool = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS)
+        return _pool
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if isinstance(pool, ThreadPoolExecutor):
+        return pool.submit(fn, *args).result()
+    return pool.apply(fn, args)
+
+
+def hash_password(password: str) -> bytes:
+    return _run(bcrypt.hashpw, password.encode(), bcrypt.gensalt(_rounds))
+
+
+def check_password(password: str, hashed: bytes) -> bool:
+    return _run(bcrypt.checkpw, password.encode(), hashed)
+
+
+def needs_rehash(hashed: bytes) -> bool:
+    """
+    Checks if a hash was made with a different cost factor than the current one.
+    """
+    try:
+        return int(hashed.split(b"$")[2]) != _rounds
+    except (IndexError, ValueError):
+        return False
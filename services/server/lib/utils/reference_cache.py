@@ -0,0 +1,119 @@
+"""
+In-process cache for serialized reference data, such as races, classes, backgrounds and spells.
+
+The payloads are stored as encoded JSON together with a strong ETag, so requests for reference
+data neither query the database nor serialize the models again until the data is invalidated.
+
+For example:
+
+payload = reference_cache.get(reference_cache.RACES, lambda: [race.to_json() for race in get_races()])
+
+The compressed bodies of the payloads are cached by ETag, so every version of a payload is compressed only once
+per content encoding.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from flask import json
+
+from lib.utils import compression
+
+RACES = "races"
+CLASSES = "classes"
+BACKGROUNDS = "backgrounds"
+SPELLS = "spells"
+
+_lock = threading.Lock()
+_payloads: Dict[str, "CachedPayload"] = {}
+_versions: Dict[str, int] = {}
+
+# The compressed bodies by ETag and encoding, which includes payloads extended with the data of a user.
+COMPRESSED_CACHE_SIZE = 64
+_compressed: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+
+class CachedPayload(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def _create_payload(body: bytes) -> CachedPayload:
+    return CachedPayload(body=body, etag=hashlib.sha1(body).hexdigest())
+
+
+def get(key: str, loader: Callable[[], List]) -> CachedPayload:
+    """
+    Returns the cached payload for the given key, loading and serializing it if it is not cached yet.
+
+    :param key: The name of the reference data.
+    :param loader: Returns the JSON serializable reference data when the payload is not cached.
+    :return: The cached payload.
+    """
+    payload = _payloads.get(key)
+    if payload is not None:
+        return payload
+
+    with _lock:
+        version = _versions.get(key, 0)
+
+    payload = _create_payload(json.dumps(loader()).encode("utf8"))
+
+    with _lock:
+        # Do not store the payload if the data was invalidated while it was loading.
+        if _versions.get(key, 0) == version:
+            _payloads[key] = payload
+
+    return payload
+
+
+def extend(payload: CachedPayload, items: List) -> CachedPayload:
+    """
+    Creates a new payload with the items appended to the list in the cached payload,
+    without decoding the cached payload.
+
+    :param payload: A cached payload containing a JSON list.
+    :param items: The JSON serializable items to append.
+    :return: A new payload which is not stored in the cache.
+    """
+    if len(items) == 0:
+        return payload
+
+    body = json.dumps(items).encode("utf8")
+    if payload.body.strip() != b"[]":
+        body = payload.body.rstrip()[:-1] + b"," + body.lstrip()[1:]
+
+    return _create_payload(body)
+
+
+def get_compressed(payload: CachedPayload, encoding: str) -> bytes:
+    """
+    Returns the body of the payload compressed with the given encoding, compressing it if it is not cached yet.
+    """
+    key = (payload.etag, encoding)
+    with _lock:
+        body = _compressed.get(key)
+        if body is not None:
+            _compressed.move_to_end(key)
+            return body
+
+    body = compression.compress(payload.body, encoding, cached=True)
+
+    with _lock:
+        _compressed[key] = body
+        while len(_compressed) > COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return body
+
+
+def invalidate(*keys: str):
+    """
+    Removes the payloads of the given keys from the cache.
+    This has to be called whenever the underlying tables are written to.
+    """
+    with _lock:
+        for key in keys:
+            _versions[key] = _versions.get(key, 0) + 1
+            _payloads.pop(key, None)
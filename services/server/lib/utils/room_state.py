@@ -0,0 +1,258 @@
+"""
+In-memory state of the campaign rooms, which is changed with JSON patch style operations.
+
+A change is a list of operations, for example:
+    [{"op": "replace", "path": "/tokens/3/x", "value": 12},
+     {"op": "add", "path": "/tokens/-", "value": {"x": 0, "y": 0}},
+     {"op": "remove", "path": "/image"}]
+
+The operations of a change are validated and applied together; if one fails, none are applied.
+Applied operations are queued per room, until they are taken as a single frame by `take_frames`.
+Consecutive replacements of the same path are coalesced, so a frame only contains the last position of a token.
+
+The state is kept in the memory of the process, so with multiple workers all clients of a campaign
+have to be connected to the same worker to receive consistent snapshots. Clients `join` and `leave` a room,
+its state is created by the first change and removed when its last member leaves.
+"""
+
+import copy
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+OPERATIONS = ("add", "replace", "remove")
+
+# Maximum amount of operations in a single change.
+MAX_OPERATIONS = 100
+# Maximum depth of a path.
+MAX_PATH_DEPTH = 16
+
+
+class RoomState:
+    def __init__(self):
+        self.state = {}
+        self.version = 0
+        self.pending = []
+
+
+_lock = threading.RLock()
+_rooms: Dict[str, RoomState] = {}
+# The amount of members of every room with at least one member.
+_members: Dict[str, int] = {}
+
+
+def _parse_path(path) -> List[str]:
+    if not isinstance(path, str) or (path != "" and not path.startswith("/")):
+        raise ValueError("Invalid path %r." % (path,))
+    if path == "":
+        return []
+
+    tokens = [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+    if len(tokens) > MAX_PATH_DEPTH:
+        raise ValueError("Path %s is too deep." % path)
+    return tokens
+
+
+def _list_index(container: list, token: str, op: str) -> int:
+    if op == "add" and token == "-":
+        return len(container)
+    if not token.isdigit():
+        raise ValueError("Invalid list index %s." % token)
+
+    index = int(token)
+    if index > len(container) or (op != "add" and index == len(container)):
+        raise ValueError("List index %d is out of range." % index)
+    return index
+
+
+def _resolve(state: dict, tokens: List[str]) -> Any:
+    container = state
+    for token in tokens:
+        if isinstance(container, dict):
+            if token not in container:
+                raise ValueError("Path element %s does not exist." % token)
+            container = container[token]
+        elif isinstance(container, list):
+            container = container[_list_index(container, token, "get")]
+        else:
+            raise ValueError("Path element %s is not a container." % token)
+    return container
+
+
+def _apply_operation(state: dict, operation: dict, undo: List):
+    """
+    Applies a single operation to the state, and appends the function which reverts it to the undo list.
+    """
+    if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+        raise ValueError("Invalid operation %r." % (operation,))
+
+    op = operation["op"]
+    tokens = _parse_path(operation.get("path"))
+    if op != "remove" and "value" not in operation:
+        raise ValueError("Operation %s requires a value." % op)
+    # The state does not share objects with the queued operations, which are emitted later.
+    value = copy.deepcopy(operation.get("value"))
+
+    if len(tokens) == 0:
+        if op == "remove" or not isinstance(value, dict):
+            raise ValueError("The root of the state can only be replaced by an object.")
+        previous = dict(state)
+        state.clear()
+        state.update(value)
+        undo.append(lambda: (state.clear(), state.update(previous)))
+        return
+
+    parent = _resolve(state, tokens[:-1])
+    key = tokens[-1]
+
+    if isinstance(parent, dict):
+        exists = key in parent
+        if op != "add" and not exists:
+            raise ValueError("Path element %s does not exist." % key)
+
+        previous = parent.get(key)
+        if op == "remove":
+            del parent[key]
+        else:
+            parent[key] = value
+
+        if exists:
+            undo.append(lambda: parent.__setitem__(key, previous))
+        else:
+            undo.append(lambda: parent.pop(key))
+    elif isinstance(parent, list):
+        index = _list_index(parent, key, op)
+        if op == "add":
+            parent.insert(index, value)
+            undo.append(lambda: parent.pop(index))
+        elif op == "replace":
+            previous = parent[index]
+            parent[index] = value
+            undo.append(lambda: parent.__setitem__(index, previous))
+        else:
+            previous = parent.pop(index)
+            undo.append(lambda: parent.insert(index, previous))
+    else:
+        raise ValueError("Path element %s is not a container." % key)
+
+
+def _queue(pending: List[dict], operation: dict):
+    """
+    Queues an applied operation, dropping the previous replacement of the same path.
+    A replacement is only dropped if no operation in between touches a parent or child of the path,
+    and there is no structural change in between, as adding or removing list elements changes
+    the meaning of the paths before it.
+    """
+    if operation["op"] == "replace":
+        path = operation["path"]
+        for i in range(len(pending) - 1, -1, -1):
+            if pending[i]["op"] != "replace":
+                break
+            if pending[i]["path"] == path:
+                del pending[i]
+                break
+            if _overlaps(pending[i]["path"], path):
+                break
+    pending.append(operation)
+
+
+def _overlaps(a: str, b: str) -> bool:
+    return a.startswith(b + "/") or b.startswith(a + "/") or a == "" or b == ""
+
+
+def apply(room: str, operations: List[dict]) -> int:
+    """
+    Validates and applies a change to the state of the room.
+
+    :param room: The room of the campaign.
+    :param operations: The JSON patch style operations.
+    :return: The version of the state after the change.
+    :raises: ValueError if the change is invalid, or the room has no members, in which case the state is unchanged.
+    """
+    if not isinstance(operations, list) or len(operations) == 0:
+        raise ValueError("A change has to be a non empty list of operations.")
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError("A change can contain at most %d operations." % MAX_OPERATIONS)
+
+    with _lock:
+        # The state of a room without members would never be removed.
+        if room not in _members:
+            raise ValueError("Join the room before changing its state.")
+        room_state = _rooms.setdefault(room, RoomState())
+
+        undo = []
+        try:
+            for operation in operations:
+                _apply_operation(room_state.state, operation, undo)
+        except ValueError:
+            for revert in reversed(undo):
+                revert()
+            raise
+
+        for operation in operations:
+            queued = {"op": operation["op"], "path": operation["path"]}
+            if "value" in operation:
+                queued["value"] = operation["value"]
+            _queue(room_state.pending, queued)
+
+        room_state.version += 1
+        return room_state.version
+
+
+def take_frames() -> List[Tuple[str, dict]]:
+    """
+    Takes the queued operations of all rooms.
+
+    :return: A list of (room, frame) tuples, where the frame contains the version of the state
+             after the operations, and the operations.
+    """
+    frames = []
+    with _lock:
+        for room, room_state in _rooms.items():
+            if len(room_state.pending) > 0:
+                frames.append((room, _frame(room, room_state)))
+    return frames
+
+
+def join(room: str):
+    """
+    Adds a member to a room, changes of the room are only accepted while it has members.
+    """
+    with _lock:
+        _members[room] = _members.get(room, 0) + 1
+
+
+def take_frame(room: str) -> Tuple[Optional[dict], dict]:
+    """
+    Takes the queued operations of a single room, together with a snapshot of the state after them.
+    This is used when a client joins, as it then does not receive the operations already in its snapshot.
+
+    :return: A tuple (frame, snapshot), the frame is None if no operations were queued.
+    """
+    with _lock:
+        room_state = _rooms.get(room)
+        if room_state is None:
+            return None, {"campaign": room, "version": 0, "state": {}}
+
+        frame = _frame(room, room_state) if len(room_state.pending) > 0 else None
+        snapshot = {"campaign": room, "version": room_state.version, "state": copy.deepcopy(room_state.state)}
+        return frame, snapshot
+
+
+def leave(room: str):
+    """
+    Removes a member from a room. The state of the room is removed with its last member.
+    """
+    with _lock:
+        members = _members.get(room, 0) - 1
+        if members > 0:
+            _members[room] = members
+            return
+
+        _members.pop(room, None)
+        _rooms.pop(room, None)
+
+
+def _frame(room: str, room_state: RoomState) -> dict:
+    frame = {"campaign": room, "version": room_state.version, "patch": room_state.pending}
+    room_state.pending = []
+    return frame
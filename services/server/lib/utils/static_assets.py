@@ -0,0 +1,151 @@
+"""
+Fingerprinted static assets, listed in a manifest which is created at build time by build_assets.py.
+
+Every asset gets a copy with the hash of its content in the name, such as index.3f2a9c0d41b7.js, and compressible
+assets also get .br and .gz variants of that copy. Because the name changes with the content, the hashed copies
+can be cached by browsers for a year. Templates refer to an asset with `asset_url("index.js")`, which is the
+path of the hashed copy, or of the asset itself when it is not in the manifest.
+
+The manifest is stored as manifest.json in the static folder:
+    {"version": 1, "assets": {"index.js": {"file": "index.3f2a9c0d41b7.js", "encodings": ["br", "gzip"]}}}
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Assets which are loaded by their name from the templates, the images and audio are loaded by name from code.
+FINGERPRINT_EXTENSIONS = (".js", ".css", ".map", ".svg", ".ico", ".woff", ".woff2", ".ttf", ".eot")
+COMPRESS_EXTENSIONS = (".js", ".css", ".map", ".svg", ".ico", ".ttf", ".eot", ".json")
+# Folders with files which are created at runtime.
+SKIP_FOLDERS = ("images/uploads", "images/qr_codes")
+
+ENCODING_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+HASH_LENGTH = 12
+
+_assets: Dict[str, dict] = {}
+# The assets by the name of their hashed copy.
+_hashed: Dict[str, dict] = {}
+
+
+def _hashed_name(filename: str, digest: str) -> str:
+    stem, extension = os.path.splitext(filename)
+    return "%s.%s%s" % (stem, digest[:HASH_LENGTH], extension)
+
+
+def _is_hashed_copy(filename: str) -> bool:
+    stem, extension = os.path.splitext(filename)
+    digest = os.path.splitext(stem)[1][1:]
+    return len(digest) == HASH_LENGTH and all(c in "0123456789abcdef" for c in digest)
+
+
+def _write(path: str, data: bytes):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def build_manifest(static_folder: str, min_size: int = 256) -> dict:
+    """
+    Creates the hashed copies and their compressed variants of the assets in the static folder,
+    and writes the manifest. The copies of earlier builds are kept, for clients which still use them.
+
+    :param min_size: Assets smaller than this are not compressed.
+    :return: The manifest.
+    """
+    assets = {}
+    for root, folders, files in os.walk(static_folder):
+        relative_root = os.path.relpath(root, static_folder).replace(os.sep, "/")
+        folders[:] = [folder for folder in folders
+                      if (folder if relative_root == "." else relative_root + "/" + folder) not in SKIP_FOLDERS]
+
+        for file in sorted(files):
+            filename = file if relative_root == "." else relative_root + "/" + file
+            if not filename.endswith(FINGERPRINT_EXTENSIONS) or _is_hashed_copy(file):
+                continue
+
+            with open(os.path.join(root, file), "rb") as f:
+                data = f.read()
+            hashed = _hashed_name(filename, hashlib.sha256(data).hexdigest())
+            hashed_path = os.path.join(static_folder, hashed)
+            if not os.path.isfile(hashed_path):
+                shutil.copyfile(os.path.join(root, file), hashed_path)
+
+            encodings = []
+            if filename.endswith(COMPRESS_EXTENSIONS) and len(data) >= min_size:
+                if brotli is not None:
+                    if not os.path.isfile(hashed_path + ".br"):
+                        _write(hashed_path + ".br", brotli.compress(data, quality=11))
+                    encodings.append("br")
+                if not os.path.isfile(hashed_path + ".gz"):
+                    _write(hashed_path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+                encodings.append("gzip")
+
+            assets[filename] = {"file": hashed, "encodings": encodings}
+
+    manifest = {"version": MANIFEST_VERSION, "assets": assets}
+    _write(os.path.join(static_folder, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(static_folder: str) -> int:
+    """
+    Loads the manifest of the static folder, if it was built.
+
+    :return: The amount of assets in the manifest.
+    """
+    global _assets, _hashed
+
+    path = os.path.join(static_folder, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        _assets, _hashed = {}, {}
+        return 0
+
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError("Unsupported asset manifest version %s" % manifest.get("version"))
+
+    _assets = manifest["assets"]
+    _hashed = {asset["file"]: asset for asset in _assets.values()}
+    return len(_assets)
+
+
+def asset_path(filename: str) -> str:
+    """
+    :return: The path of the hashed copy of an asset relative to the static folder, or the filename itself if
+             the asset is not in the manifest.
+    """
+    asset = _assets.get(filename)
+    return asset["file"] if asset is not None else filename
+
+
+def find_hashed(filename: str) -> Optional[dict]:
+    """
+    :return: The manifest entry if the filename is a hashed copy, otherwise None.
+    """
+    return _hashed.get(filename)
+
+
+def choose_encoding(encodings: List[str], accept_encodings) -> Optional[str]:
+    """
+    Chooses the precompressed variant to send.
+
+    :param encodings: The encodings of the asset in the manifest.
+    :param accept_encodings: The parsed Accept-Encoding header, `request.accept_encodings`.
+    """
+    for encoding in ("br", "gzip"):
+        if encoding in encodings and accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
@@ -1,4 +1,6 @@
-from flask import render_template, send_from_directory
+import hashlib
+
+from flask import Response, render_template, request, send_from_directory
 
 from services.server import app
 from lib.user_session import session_is_authed, session_user_set, session_user
@@ -6,10 +8,25 @@ from endpoints import require_login
 from lib.service import campaign_service
 
 
+# The rendered index.html and its ETag, it only changes when the server is restarted after a build.
+_index = None
+
+
 @app.route('/', defaults={"text": ""})
 @app.route('/<path:text>')
 def index(text):
-    return render_template('index.html')
+    global _index
+
+    # Templates are reloaded in debug mode, render them every time.
+    if _index is None or app.debug:
+        body = render_template('index.html').encode("utf8")
+        _index = (body, hashlib.sha1(body).hexdigest())
+
+    body, etag = _index
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.route('/api/<path:text>')
@@ -0,0 +1,20 @@
+from flask import Response
+
+import lib.database
+from services.server import app
+from lib import user_session
+from lib.utils import metrics
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Returns the request metrics of this worker in the Prometheus text format.
+    """
+    gauges = {}
+    for key, value in lib.database.pool_statistics().items():
+        gauges["dndool_db_pool_" + key] = value
+    for key, value in user_session.user_cache_statistics().items():
+        gauges["dndool_user_cache_" + key] = value
+
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,41 @@
+import mimetypes
+
+from flask import request, send_from_directory, url_for
+
+from services.server import app
+from lib.utils import static_assets
+
+# Hashed copies of assets never change, so they are cached for a year.
+HASHED_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@app.endpoint('static')
+def static(filename):
+    """
+    Serves the static files, hashed copies of assets as immutable and precompressed if the client accepts it.
+    """
+    asset = static_assets.find_hashed(filename)
+    if asset is None:
+        return app.send_static_file(filename)
+
+    encoding = static_assets.choose_encoding(asset["encodings"], request.accept_encodings)
+    if encoding is None:
+        response = send_from_directory(app.static_folder, filename, max_age=HASHED_MAX_AGE)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(app.static_folder, filename + static_assets.ENCODING_EXTENSIONS[encoding],
+                                       mimetype=mimetype, max_age=HASHED_MAX_AGE)
+        response.content_encoding = encoding
+
+    if len(asset["encodings"]) > 0:
+        response.vary.add("Accept-Encoding")
+    response.cache_control.immutable = True
+    return response
+
+
+@app.template_global()
+def asset_url(filename):
+    return url_for('static', filename=static_assets.asset_path(filename))
+
+
+print("Loaded %d fingerprinted static assets." % static_assets.load_manifest(app.static_folder))
@@ -0,0 +1,45 @@
+"""
+Exports the base game data to a reference data snapshot, or loads a snapshot into the database.
+A new deployment can load a snapshot instead of running scrape_api against the dnd api's.
+
+The server also loads the snapshot configured as `snapshot` in the [database] section of config.ini on startup.
+"""
+
+import argparse
+
+from lib.service import snapshot_service
+from services.server import app
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Export or load a snapshot of the base game data.")
+
+    parser.add_argument("command", type=str, help="Either export or load.")
+    parser.add_argument("file", type=str, help="The snapshot file, for example storage/reference.jsonl.gz")
+    parser.add_argument("--tables", type=str, nargs="*",
+                        help="The tables to export. Exports all tables by default. "
+                             "Choose from: %s" % ", ".join(snapshot_service.SNAPSHOT_MODELS.keys()))
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    if args.command == "export":
+        for table in args.tables or []:
+            if table not in snapshot_service.SNAPSHOT_MODELS:
+                raise SystemExit("Unknown table %s, choose from: %s"
+                                 % (table, ", ".join(snapshot_service.SNAPSHOT_MODELS.keys())))
+
+        header = snapshot_service.export_snapshot(args.file, args.tables)
+        for table, info in header["tables"].items():
+            print("Exported %d rows of %s" % (info["rows"], table))
+    elif args.command == "load":
+        for table, status in snapshot_service.load_snapshot(args.file).items():
+            print("%s: %s" % (table, status))
+    else:
+        raise SystemExit("Unknown command %s, choose from: export, load" % args.command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Starts the server once for the tests, with a fresh SQLite database in a temporary directory.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "services", "server")]
+
+CONFIG = """
+[app]
+debug = false
+port = 5000
+host = localhost
+secret = test
+bcrypt_rounds = 4
+
+[email]
+server = localhost
+address = test@localhost.local
+password = test
+transport = memory
+
+[database]
+url = sqlite:///%s
+"""
+
+
+@pytest.fixture(scope="session")
+def app():
+    directory = tempfile.mkdtemp()
+    config_file = os.path.join(directory, "config.ini")
+    with open(config_file, "w") as f:
+        f.write(CONFIG % os.path.join(directory, "db.sqlite"))
+
+    # The server creates its storage folders in the working directory.
+    os.chdir(directory)
+    os.environ["CONFIG_FILE"] = config_file
+
+    from services.server import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def register(client):
+    """
+    Registers a user and logs the client in as that user.
+    """
+
+    def register_user(name: str):
+        response = client.post("/api/register", json={"name": name, "password": "password",
+                                                     "email": "%s@localhost.local" % name})
+        assert response.status_code == 200
+        return response.get_json()["user"]
+
+    return register_user
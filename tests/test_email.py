@@ -0,0 +1,5 @@
+def test_sender_is_started_with_server(app):
+    from lib.service import email_service
+
+    # Started by the initialisation of the server, not by the first reset of a password.
+    assert email_service._sender is not None
@@ -0,0 +1,85 @@
+import base64
+import io
+
+from PIL import Image
+
+
+def create_campaign(user: dict) -> int:
+    """
+    Creates a campaign in which the user has a player.
+    It is created directly, the endpoint also writes a QR code into the client folder.
+    """
+    from lib.database import session
+    from lib.model.models import CampaignModel, PlayerModel
+
+    with session() as db:
+        campaign = CampaignModel(user_id=user["id"], name="Test campaign")
+        db.add(campaign)
+        db.flush()
+        db.add(PlayerModel(campaign_id=campaign.id, owner_id=user["id"], name="Test player"))
+        db.commit()
+        return campaign.id
+
+
+def png_data_url() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 3)).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_editor_map_rejects_html(client, register):
+    campaign_id = create_campaign(register("map_html"))
+
+    html = "data:text/html;base64," + base64.b64encode(b"<script>alert(1)</script>").decode()
+    response = client.post("/api/%d/maps" % campaign_id, json={"map_base64": html})
+    assert response.status_code == 400
+
+
+def test_editor_map_rejects_svg(client, register):
+    campaign_id = create_campaign(register("map_svg"))
+
+    svg = base64.b64encode(b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>').decode()
+    response = client.post("/api/%d/maps" % campaign_id, json={"map_base64": "data:image/svg+xml;base64," + svg})
+    assert response.status_code == 400
+
+
+def test_editor_map_image_type_is_taken_from_image(client, register):
+    campaign_id = create_campaign(register("map_png"))
+
+    # The client claims the image is html, it is stored as the png it actually is.
+    data_url = png_data_url().replace("data:image/png", "data:text/html")
+    response = client.post("/api/%d/maps" % campaign_id, json={"map_base64": data_url})
+    assert response.status_code == 200
+    map_id = response.get_json()["map_id"]
+
+    response = client.get("/api/%d/maps/%d/image" % (campaign_id, map_id))
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+
+
+def test_processed_map_image_is_sent_to_campaign_room(app, register, monkeypatch, tmp_path):
+    from concurrent.futures import Future
+    from lib.database import session
+    from lib.model.models import MapModel
+    from lib.service import map_service
+
+    campaign_id = create_campaign(register("map_event"))
+    with session() as db:
+        map_model = MapModel(campaign_id=campaign_id, name="Test map", filename="old.png")
+        db.add(map_model)
+        db.commit()
+        map_id = map_model.id
+
+    emitted = []
+    monkeypatch.setattr(map_service.socketio, "emit", lambda *args, **kwargs: emitted.append((args, kwargs)))
+    future = Future()
+    future.set_result(None)
+    map_service._finish_map_image(map_id, "new.png", str(tmp_path / "upload.png"), future)
+
+    assert len(emitted) == 1
+    (event, data), kwargs = emitted[0]
+    assert event == "map"
+    assert kwargs["room"] == data["campaign"] == "Test campaign"
+    assert data["map"]["id"] == map_id
+    assert data["map"]["filename"] == "new.png"
@@ -0,0 +1,71 @@
+import datetime
+
+
+def count_messages(text: str) -> int:
+    from lib.database import session
+    from lib.model.models import MessageModel
+
+    with session() as db:
+        return db.query(MessageModel).filter(MessageModel.message == text).count()
+
+
+def queue_message(campaign_id, text: str):
+    from lib.service import message_service
+
+    with message_service._lock:
+        message_service._queue.append((0, {"campaign_id": campaign_id, "sender_id": None, "message": text,
+                                           "time": datetime.datetime.now()}))
+
+
+def test_failing_chat_message_is_dropped(app):
+    from lib.service import message_service
+
+    # A message without a campaign can never be written.
+    queue_message(None, "flush bad")
+    queue_message(1, "flush good")
+
+    assert message_service.flush_chat_messages() == 1
+    assert count_messages("flush good") == 1
+
+    for _ in range(message_service.MAX_ATTEMPTS - 1):
+        assert message_service.flush_chat_messages() == 0
+    assert message_service._queue == []
+    assert count_messages("flush bad") == 0
+
+
+def test_dungeon_master_messages_are_listed(client, register):
+    from lib.database import session
+    from lib.model.models import CampaignModel
+    from lib.service import message_service
+
+    user = register("messages_dm")
+    with session() as db:
+        campaign = CampaignModel(user_id=user["id"], name="Test campaign")
+        db.add(campaign)
+        db.commit()
+        campaign_id = campaign.id
+
+    # The dungeon master has no player in the campaign.
+    queue_message(campaign_id, "dm message")
+    assert message_service.flush_chat_messages() == 1
+
+    response = client.post("/api/getmessages", json={"campaign_id": campaign_id})
+    assert response.status_code == 200
+    messages = response.get_json()["messages"]
+    assert [(m["sender_name"], m["player_name"], m["message"]) for m in messages] == \
+           [("messages_dm", None, "dm message")]
+
+
+def test_history_of_least_recently_used_room_is_removed(app, monkeypatch):
+    from lib.service import message_service
+
+    monkeypatch.setattr(message_service, "HISTORY_ROOMS", 2)
+    user = type("User", (), {"name": "history"})()
+
+    message_service.queue_chat_message("room a", None, user, "a")
+    message_service.queue_chat_message("room b", None, user, "b")
+    assert len(message_service.get_chat_history("room a", None)) == 1
+    message_service.queue_chat_message("room c", None, user, "c")
+
+    assert list(message_service._history) == ["room a", "room c"]
+    assert message_service.get_chat_history("room b", None) == []
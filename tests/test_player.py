@@ -0,0 +1,41 @@
+SPELL = {"name": "Test bolt", "description": "A test spell.", "level": 1, "spell_range": "60 feet",
+         "components": "V", "ritual": False, "concentration": False, "duration": "Instantaneous",
+         "casting_time": "1 action", "school": "Evocation"}
+
+
+def create_player(client) -> int:
+    assert client.post("/api/user/player", json={"name": "Tester"}).status_code == 200
+    return client.get("/api/user/players").get_json()[-1]["id"]
+
+
+def test_owner_deletes_own_spell(client, register):
+    register("spell_owner")
+    player_id = create_player(client)
+
+    assert client.post("/api/user/spells", json=SPELL).status_code == 201
+    spell_id = [spell["id"] for spell in client.get("/api/user/spells").get_json()
+                if spell.get("name") == SPELL["name"]][-1]
+    assert client.post("/api/player/%d/spells" % player_id, json={"spell_id": spell_id}).status_code == 200
+
+    response = client.delete("/api/player/%d/spells/%d" % (player_id, spell_id))
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+
+def test_owner_deletes_own_item(client, register):
+    register("item_owner")
+    player_id = create_player(client)
+
+    response = client.delete("/api/player/%d/item/%d" % (player_id, 1))
+    assert response.status_code == 200
+    assert response.get_json()["error"] == ""
+
+
+def test_other_user_can_not_delete_spell(app, client, register):
+    register("spell_owner_2")
+    player_id = create_player(client)
+
+    other = app.test_client()
+    other.post("/api/register", json={"name": "intruder", "password": "password",
+                                      "email": "intruder@localhost.local"})
+    assert other.delete("/api/player/%d/spells/%d" % (player_id, 1)).status_code == 401
@@ -0,0 +1,41 @@
+import pytest
+
+
+def test_room_state_is_removed_with_last_member(app):
+    from lib.utils import room_state
+
+    room = "room state lifecycle"
+    with pytest.raises(ValueError):
+        room_state.apply(room, [{"op": "add", "path": "/token", "value": 1}])
+
+    room_state.join(room)
+    assert room_state.take_frame(room) == (None, {"campaign": room, "version": 0, "state": {}})
+    assert room not in room_state._rooms
+
+    room_state.join(room)
+    room_state.apply(room, [{"op": "add", "path": "/token", "value": 1}])
+    room_state.leave(room)
+    assert room_state.take_frame(room)[1]["state"] == {"token": 1}
+
+    room_state.leave(room)
+    assert room not in room_state._rooms
+    assert room not in room_state._members
+
+
+def test_room_state_is_removed_when_last_connection_disconnects(app, client, register):
+    from services.server import socketio
+    from lib.utils import room_state
+
+    register("room_state_socket")
+    room = "room state socket"
+    socket = socketio.test_client(app, flask_test_client=client)
+    socket.emit("join", {"campaign": room})
+    socket.emit("join", {"campaign": room})
+    assert room_state._members[room] == 1
+
+    socket.emit("update", {"campaign": room, "patch": [{"op": "add", "path": "/token", "value": 1}]})
+    assert room in room_state._rooms
+
+    socket.disconnect()
+    assert room not in room_state._rooms
+    assert room not in room_state._members
@@ -0,0 +1,25 @@
+def test_snapshot_tables_with_custom_rows_are_up_to_date(app, register, tmp_path):
+    from lib.database import request_session
+    from lib.model.models import BackgroundModel
+    from lib.service import snapshot_service
+
+    user = register("snapshot_custom")
+    db = request_session()
+    db.add_all([BackgroundModel(id=9001, name="Acolyte"), BackgroundModel(id=9002, name="Sage")])
+    db.commit()
+
+    path = str(tmp_path / "reference.jsonl.gz")
+    snapshot_service.export_snapshot(path, ["background"])
+
+    # A custom row of a user took the id of a snapshot row, and a base row was added which is not in the snapshot.
+    db.query(BackgroundModel).filter(BackgroundModel.id == 9002).delete()
+    db.add_all([BackgroundModel(id=9002, name="Custom", owner_id=user["id"]), BackgroundModel(id=9003, name="Noble")])
+    db.commit()
+    assert snapshot_service.load_snapshot(path) == {"background": "up to date"}
+
+    db.query(BackgroundModel).filter(BackgroundModel.id == 9001).update({"name": "Changed"})
+    db.commit()
+    assert snapshot_service.load_snapshot(path) == {"background": "loaded 2 rows, skipped 1"}
+    assert db.query(BackgroundModel).get(9001).name == "Acolyte"
+    assert db.query(BackgroundModel).get(9002).name == "Custom"
+    request_session().remove()